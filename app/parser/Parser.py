@@ -1,17 +1,70 @@
-from typing import Dict
-from time import sleep
+from typing import TYPE_CHECKING, Dict, List, Optional
+from collections import defaultdict
+from contextlib import nullcontext
+from threading import Lock
+from time import perf_counter
+from urllib.parse import urljoin
+import re
 from DrissionPage import ChromiumPage
-from database.flat_offers_manager import FlatOffersManager
-from database.database import get_flat_offer_fields
+from database.database import get_flat_offer_fields, validate_flat_offer
+from database.crawl_frontier import CrawlFrontier
+from tab_pool import TabPool
+from http_fetcher import HttpFetcher, StaticPage
+from waits import Waiter
+from search_urls import BASE_URL, build_search_url
+from resource_blocker import ResourceBlocker
+from governor import CrawlGovernor, GovernedRequest, looks_like_challenge
 import logging
 
+if TYPE_CHECKING:
+    # Only for annotations; the replay harness runs without a manager
+    from database.flat_offers_manager import FlatOffersManager
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Offer links end in '.<data_id>.html', e.g. /wg-zimmer-in-Muenchen-Schwabing.1234567.html
+OFFER_ID_PATTERN = re.compile(r'\.(\d+)\.html')
+
+def offer_id_from_url(url: str) -> Optional[str]:
+    match = OFFER_ID_PATTERN.search(url or '')
+    return match.group(1) if match else None
+
 class Parser:
-    def __init__(self, driver: ChromiumPage, flat_offers_manager: FlatOffersManager, type: int, city: int):
+    def __init__(self, driver: ChromiumPage, flat_offers_manager: 'FlatOffersManager', type: int, city: int, workers: int = 4, fetch_mode: str = 'browser',
+                 known_stop: int = 5, max_pages: Optional[int] = None, backfill: bool = False,
+                 direct_url: bool = True, browser=None, frontier: Optional[CrawlFrontier] = None,
+                 resource_blocker: Optional[ResourceBlocker] = None, open_search: bool = True,
+                 governor: Optional[CrawlGovernor] = None):
         self.driver = driver
         self.flat_offers_manager = flat_offers_manager
+        # Paces every page load and HTTP fetch; shared by all parsers of a process
+        self.governor = governor
+        self.resource_blocker = resource_blocker
+        # Resource counters of this run's pages, summed from every tab
+        self.resource_totals: Dict[str, int] = defaultdict(int)
+        self.resource_lock = Lock()
+        if resource_blocker is not None:
+            resource_blocker.attach(driver)
+        # Pending offers and the backfill page cursor survive crashes in the frontier
+        self.frontier = frontier
+        self.offer_errors: Dict[str, str] = {}
+        # Offer tabs are opened from the shared browser when the search runs in a tab of its own
+        self.tab_pool = TabPool(browser if browser is not None else driver, workers,
+                                on_new_tab=resource_blocker.attach if resource_blocker is not None else None)
+        self.waiter = Waiter()
+        # 'browser' renders every offer in a tab, 'http' fetches server-rendered HTML
+        # and only falls back to a tab when the static parse is incomplete
+        self.fetch_mode = fetch_mode
+        self.http_fetcher = HttpFetcher(pool_size=workers, governor=governor) if fetch_mode == 'http' else None
+        self.extract_times: List[float] = []
+        # Results are newest first, so an incremental crawl stops after this many
+        # consecutive known offers; a backfill walks every page regardless
+        self.known_stop = known_stop
+        self.max_pages = max_pages
+        self.backfill = backfill
+        self.known_streak = 0
+        self.listing_ids: Dict[str, str] = {}
         self.type_code = type
         offer_type_dict = {
             0: "WG-Zimmer",
@@ -24,17 +77,63 @@ class Parser:
             1: "Berlin"
         }
         logging.info(f"Initializing Parser for type: {offer_type_dict[type]} (code: {type})")
-        self.accept_cookies()
-        self.unselect_list_option('dropdown-menu inner')
         self.type = offer_type_dict[type]
         self.offer_type_id = type
         self.city_id = city
         self.city = city_dict[city]
-        self.select_list_option('dropdown-menu inner', type)
-        self.fill_input('form-control autocomplete wgg_input city_loader_bar', city_dict[city])
+        self.target = f"{type}:{city}"
+        self.page_index = 0
+        # The replay harness passes open_search=False and feeds saved pages instead
+        if not open_search:
+            return
+        if not direct_url or not self.open_search_url():
+            self.search_with_form()
+
+    def open_search_url(self) -> bool:
+        """Navigate straight to the results page, returning False if it shows no listings"""
+        url = build_search_url(self.offer_type_id, self.city_id)
+        logging.info(f"Opening search results directly: {url}")
+        if self.open_page(self.driver, url, 'search_url', '@class:truncate_title noprint', timeout=5):
+            self.accept_cookies()
+            return True
+        self.accept_cookies()
+        logging.warning(f"No listings at {url}, falling back to the search form")
+        return False
+
+    def search_with_form(self):
+        """Fill the search form on the start page; the slow path kept for when the URL scheme changes"""
+        logging.info(f"Navigating to base URL: {BASE_URL}")
+        with self.paced():
+            self.driver.get(BASE_URL)
+        self.accept_cookies()
+        self.unselect_list_option('dropdown-menu inner')
+        self.select_list_option('dropdown-menu inner', self.offer_type_id)
+        self.fill_input('form-control autocomplete wgg_input city_loader_bar', self.city)
         logging.info("Clicking search button")
         self.driver.ele('tag:input@id:search_button').click()
 
+    def paced(self):
+        """Context for one request, throttled by the governor when there is one"""
+        if self.governor is None:
+            return nullcontext(GovernedRequest())
+        return self.governor.request()
+
+    def open_page(self, page, url: str, stage: str, locator: str, timeout: Optional[float] = None) -> bool:
+        """Load a URL in a tab and wait for an element, reporting challenge pages to the governor"""
+        with self.paced() as request:
+            # False when the page could not be loaded at all
+            opened = page.get(url)
+            loaded = self.waiter.until(stage, lambda t: page.wait.eles_loaded(locator, timeout=t),
+                                       timeout=timeout, on_retry=page.refresh)
+            if not loaded and looks_like_challenge(page.html):
+                logging.warning(f"Challenge page instead of {url}")
+                request.challenge()
+            elif not loaded and opened:
+                # The site answered without the element, e.g. the 404 page of a removed offer;
+                # waiting for it made the request slow, but the site is not overloaded
+                request.ok()
+        return loaded
+
     def accept_cookies(self):
         try:
             logging.info("Accepting cookies")
@@ -42,7 +141,7 @@ class Parser:
             box = box.ele('tag:div@class=cmpboxbtns')
             box.ele('tag:a@role:button').click()
             logging.info("Cookies consent box accepted")
-            sleep(1)
+            self.waiter.until('cookies', lambda t: self.driver.wait.ele_deleted(box, timeout=t), timeout=3)
         except Exception as e:
             logging.info(f"No cookies consent box found: {e}")
 
@@ -52,7 +151,7 @@ class Parser:
         form_element.ele(f'tag:input@class:{class_name}').clear()
         form_element.ele(f'tag:input@class:{class_name}').input(value)
         logging.debug(f"Input field '{class_name}' filled successfully")
-        sleep(0.01)
+        self.waiter.until('autocomplete', lambda t: self.driver.wait.ele_displayed('tag:div@class:autocomplete-suggestion', timeout=t))
         logging.info("Selecting autocomplete suggestion")
         self.driver.ele(f'tag:div@class:autocomplete-suggestion').click()
         logging.debug("Autocomplete suggestion selected successfully")
@@ -78,7 +177,7 @@ class Parser:
             logging.error(f"Invalid option index: {option_index}. Available options: 0-{len(options)-1}")
 
         form_element.ele(f'tag:button@class:btn dropdown-toggle form-control wgg_select').click()
-        sleep(1)
+        self.waiter.until('dropdown', lambda t: self.driver.wait.ele_hidden(list_element, timeout=t), timeout=3)
 
     def unselect_list_option(self, list_class_name: str):
         logging.info(f"Unselecting all options from list '{list_class_name}'")
@@ -90,7 +189,6 @@ class Parser:
 
         unselected_count = 0
         for i, option in enumerate(options):
-            sleep(0.11)
             if option.attr('class') == 'selected':
                 option.click()
                 unselected_count += 1
@@ -98,7 +196,7 @@ class Parser:
 
         logging.info(f"Unselected {unselected_count} options in total")
         form_element.ele(f'tag:button@class:btn dropdown-toggle form-control wgg_select').click()
-        sleep(1)
+        self.waiter.until('dropdown', lambda t: self.driver.wait.ele_hidden(list_element, timeout=t), timeout=3)
 
     def get_page(self, url):
         logging.info(f"Navigating to URL: {url}")
@@ -111,11 +209,62 @@ class Parser:
         logging.debug(f"Found {len(ads) if ads else 0} advertisements")
         return ads
 
-    def get_ad_data(self, page: ChromiumPage):
+    def get_listing_cards(self) -> List[dict]:
+        """Read every offer card on the current results page from one HTML snapshot"""
+        listing = StaticPage.from_page(self.driver)
+        cards = []
+        for title in listing.eles('@class:truncate_title noprint'):
+            link = title.ele('tag:a')
+            if not link or not link.attr('href'):
+                continue
+            url = urljoin(listing.url, link.attr('href'))
+            card = {'url': url, 'data_id': offer_id_from_url(url), 'name': link.text}
+            try:
+                card.update(self.get_card_data(title.parent('@class:offer_list_item')))
+            except Exception as e:
+                logging.warning(f"Failed to read listing card of {url}: {str(e)}")
+            cards.append(card)
+        return cards
+
+    def get_card_data(self, card) -> dict:
+        """Title, rent, size, district and dates shown on a listing card"""
+        data = {}
+        rent = card.ele('tag:b@text():€')
+        if rent:
+            data['total_rent'] = rent.text
+        area = card.ele('tag:b@text():m²')
+        if area:
+            data['area'] = area.text
+        summary = card.ele('tag:div@class:col-xs-11')
+        if summary:
+            # e.g. "3er WG | München Schwabing | Leopoldstraße 5"
+            parts = [part.strip() for part in summary.text.split('|')]
+            data['address'] = ' | '.join(parts[1:]) if len(parts) > 1 else parts[0]
+        dates = card.ele('tag:div@class:text-center')
+        if dates and dates.text:
+            data['availability'] = {'listing_dates': dates.text}
+        return data
+
+    def get_card_offer(self, card: dict) -> dict:
+        """Lightweight offer stored straight from the listing card, enriched from the detail page later"""
+        offer_fields = self.new_offer_fields(card['data_id'], card['url'])
+        for field in ('name', 'total_rent', 'area', 'address', 'availability'):
+            if card.get(field):
+                offer_fields[field] = card[field]
+        offer_fields['details_parsed'] = False
+        return offer_fields
+
+    def get_ad_data(self, page: ChromiumPage, data_id: Optional[str] = None):
         logging.info(f"Extracting basic data from advertisement at URL: {page.url}")
-        id = page.ele('tag:div@class:col-xs-12 col-md-6').text
-        id = id.split(' ')[1]
-        link = page.url
+        id = data_id
+        if id is None:
+            id = page.ele('tag:div@class:col-xs-12 col-md-6').text
+            id = id.split(' ')[1]
+        offer_fields = self.new_offer_fields(id, page.url)
+        logging.debug(f"Extracted ad data - ID: {id}, Type: {self.type}")
+        return offer_fields
+
+    def new_offer_fields(self, id: str, link: str) -> dict:
         offer_fields = get_flat_offer_fields()
         offer_fields['type'] = self.type
         offer_fields['data_id'] = id
@@ -125,12 +274,22 @@ class Parser:
         offer_fields['city_id'] = self.city_id
         offer_fields['city'] = self.city
         offer_fields['offer_type'] = self.type
-        logging.debug(f"Extracted ad data - ID: {id}, Type: {self.type}")
         return offer_fields
 
     def get_offer_details(self, page, offer_data):
         logging.info(f"Fetching detailed offer information for ID: {offer_data['data_id']}")
-        sleep(3)
+        data = self.extract_offer_details(page, offer_data)
+        self.save_offer(data)
+
+    def extract_offer_details(self, page, offer_data):
+        start = perf_counter()
+        data = self._extract_offer_details(StaticPage.from_page(page), offer_data)
+        elapsed = perf_counter() - start
+        self.extract_times.append(elapsed)
+        logging.debug(f"Extracted offer {data['data_id']} in {elapsed * 1000:.1f} ms")
+        return data
+
+    def _extract_offer_details(self, page: StaticPage, offer_data):
         data = offer_data
 
         main_column = page.ele('tag:div@id=main_column')
@@ -214,48 +373,241 @@ class Parser:
         descriptions = row.eles('tag:div@id:freitext_')
         data['description'] = [desc.text for desc in descriptions]
         logging.debug(f"Found {len(data['description'])} description sections")
+        return data
 
-        # Save offer
+    def save_offer(self, data):
         logging.info(f"Saving offer with ID: {data['data_id']}")
-        self.flat_offers_manager.save_offer(data)
+        self.flat_offers_manager.enrich_offer(data)
         logging.info(f"Successfully saved offer {data['data_id']} - {data['name']}")
 
-    def parse_ads(self):
-        for i in range(1):
-            logging.info(f"Processing page {i+1} of listings")
-            sleep(5)
-            offers = self.driver.eles('@class:truncate_title noprint')
-            logging.info(f"Found {len(offers)} offers on page {i+1}")
-
-            for j, offer in enumerate(offers, 1):
-                offer = offer.ele('tag:a')
-                offer_url = offer.attr('href')
-                logging.info(f"Processing offer {j}/{len(offers)} on page {i+1}")
-                logging.debug(f"Opening offer URL: {offer_url}")
-
-                new_tab = self.driver.new_tab(offer_url)
-                sleep(5)
-                try:
-                    offer_data = self.get_ad_data(new_tab)
-                    sleep(3)
-
-                    if not self.flat_offers_manager.get_offer(offer_data['data_id']):
-                        logging.info(f"Processing new offer with ID: {offer_data['data_id']}")
-                        try:
-                            self.get_offer_details(new_tab, offer_data)
-                            logging.info(f"Successfully processed offer {offer_data['data_id']}")
-                        except Exception as e:
-                            logging.error(f"Failed to process offer {offer_data['data_id']}: {str(e)}")
-                        sleep(3)
-                    else:
-                        logging.info(f"Skipping existing offer with ID: {offer_data['data_id']}")
-                except Exception as e:
-                    logging.error(f"Failed to extract offer data: {str(e)}")
-
-                logging.debug("Closing offer tab")
-                new_tab.close()
-                logging.info("------------------------")
+    def is_complete_offer(self, data) -> bool:
+        """Check that a statically parsed offer carries everything the browser parse would"""
+        if not validate_flat_offer(data):
+            return False
+        return all(data.get(field) for field in ('data_id', 'name', 'area', 'total_rent', 'address'))
+
+    def is_known_offer(self, offer_url: str, offer_data) -> bool:
+        """Offers with an ID in the listing href were already checked in bulk"""
+        if offer_url in self.listing_ids:
+            return False
+        return bool(self.flat_offers_manager.get_existing_ids([offer_data['data_id']]))
+
+    def process_offer_http(self, offer_url: str) -> str:
+        """Scrape one offer from its server-rendered HTML, returning None when the browser is needed"""
+        page = None
+        try:
+            page = self.http_fetcher.fetch(offer_url)
+            offer_data = self.get_ad_data(page, self.listing_ids.get(offer_url))
+            if self.is_known_offer(offer_url, offer_data):
+                logging.info(f"Skipping existing offer with ID: {offer_data['data_id']}")
+                return 'known'
+            data = self.extract_offer_details(page, offer_data)
+        except Exception as e:
+            if page is not None and self.governor is not None and looks_like_challenge(page.html):
+                self.governor.challenge()
+            logging.warning(f"Static parse failed for {offer_url}, falling back to browser: {str(e)}")
+            return None
+        if not self.is_complete_offer(data):
+            logging.warning(f"Static parse of {offer_url} failed validation, falling back to browser")
+            return None
+        self.save_offer(data)
+        return 'new'
+
+    def process_offer(self, tab, offer_url: str) -> str:
+        """Scrape one offer in a pool tab, returning 'new', 'known' or 'failed'"""
+        if self.http_fetcher is not None:
+            status = self.process_offer_http(offer_url)
+            if status is not None:
+                return status
+
+        logging.debug(f"Opening offer URL: {offer_url}")
+        if not self.open_page(tab, offer_url, 'offer_page', 'tag:div@id=main_column'):
+            raise TimeoutError(f"Offer page did not load: {offer_url}")
+        page = StaticPage.from_page(tab)
+        self.count_resources(tab)
+        offer_data = self.get_ad_data(page, self.listing_ids.get(offer_url))
+
+        if self.is_known_offer(offer_url, offer_data):
+            logging.info(f"Skipping existing offer with ID: {offer_data['data_id']}")
+            return 'known'
+
+        logging.info(f"Processing new offer with ID: {offer_data['data_id']}")
+        try:
+            self.get_offer_details(page, offer_data)
+            logging.info(f"Successfully processed offer {offer_data['data_id']}")
+        except Exception as e:
+            logging.error(f"Failed to process offer {offer_data['data_id']}: {str(e)}")
+            self.offer_errors[offer_url] = str(e)
+            return 'failed'
+        return 'new'
+
+    def count_resources(self, tab):
+        """Add the network counters of the page a tab just loaded to this run's totals"""
+        if self.resource_blocker is None:
+            return
+        counters = self.resource_blocker.page_report(tab)
+        if counters.get('baseline'):
+            return
+        with self.resource_lock:
+            for key, value in counters.items():
+                self.resource_totals[key] += value
+            self.resource_totals['pages'] += 1
+
+    def report_extract_times(self):
+        if not self.extract_times:
+            return
+        times = sorted(self.extract_times)
+        average = sum(times) / len(times)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        logging.info(f"Offer extraction over {len(times)} offers: "
+                     f"avg {average * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms")
+
+    def reached_known_offers(self, statuses: List[Optional[str]]) -> bool:
+        """Track consecutive known offers in listing order, carrying the streak across pages"""
+        for status in statuses:
+            if status == 'known':
+                self.known_streak += 1
+                if self.known_streak >= self.known_stop:
+                    return True
+            else:
+                self.known_streak = 0
+        return False
+
+    def next_page(self) -> bool:
+        """Navigate to the next results page, returning False on the last one"""
+        next_link = self.driver.ele('tag:a@class:page-link next', timeout=3)
+        if not next_link:
+            logging.info("No next page link found, reached the last results page")
+            return False
+        next_url = next_link.attr('href')
+        logging.info(f"Navigating to next page: {next_url}")
+        self.open_page(self.driver, next_url, 'next_page', '@class:truncate_title noprint')
+        self.page_index += 1
+        return True
+
+    def scrape_offers(self, offer_ids: Dict[str, Optional[str]]) -> Dict[str, str]:
+        """Run offer URLs (mapped to their listing data_id) through the tab pool, checkpointing in the frontier"""
+        if self.frontier is not None:
+            self.frontier.add(self.target, offer_ids)
+        self.listing_ids = {url: data_id for url, data_id in offer_ids.items() if data_id}
+        self.offer_errors = {}
+        stats = self.tab_pool.run(list(offer_ids), self.process_offer)
+        statuses = {url: stats['results'].get(url) or 'failed' for url in offer_ids}
+        if self.frontier is not None:
+            self.frontier.complete([url for url, status in statuses.items() if status != 'failed'])
+            for url, status in statuses.items():
+                if status == 'failed':
+                    error = stats['errors'].get(url) or self.offer_errors.get(url, 'unknown error')
+                    self.frontier.fail(url, error)
+        logging.info(f"{list(statuses.values()).count('new')} new offers, "
+                     f"{stats['offers_per_minute']:.1f} offers/minute")
+        return statuses
+
+    def resume(self, totals: Dict[str, int]):
+        """Retry offers left pending by an earlier run and jump to an interrupted backfill's page"""
+        if self.frontier is None:
+            return
+        pending = self.frontier.due(self.target)
+        if pending:
+            logging.info(f"Resuming {len(pending)} pending offers for target {self.target}")
+            self.count_enrichment(totals, self.scrape_offers(pending))
+        cursor = self.frontier.get_cursor(self.target) if self.backfill else None
+        if cursor is not None:
+            self.page_index = cursor + 1
+            url = build_search_url(self.offer_type_id, self.city_id, self.page_index)
+            logging.info(f"Resuming backfill of target {self.target} at page {self.page_index + 1}: {url}")
+            loaded = self.open_page(self.driver, url, 'listing_page', '@class:truncate_title noprint')
+            page_count = self.page_count() if loaded else None
+            if not loaded or (page_count is not None and self.page_index >= page_count):
+                # The listing shrank below the stored page; start the backfill over
+                found = f"{page_count} pages" if page_count else "no listings"
+                logging.warning(f"Backfill cursor of target {self.target} points past the last results page "
+                                f"({found}), restarting from the first page")
+                self.frontier.clear_cursor(self.target)
+                self.page_index = 0
+                self.open_page(self.driver, build_search_url(self.offer_type_id, self.city_id),
+                               'listing_page', '@class:truncate_title noprint')
+
+    def page_count(self) -> Optional[int]:
+        """Number of results pages from the pagination links, None when the page has none"""
+        numbers = [int(link.text) for link in StaticPage.from_page(self.driver).eles('tag:a@class:page-link')
+                   if link.text and link.text.strip().isdigit()]
+        return max(numbers) if numbers else None
+
+    def count_enrichment(self, totals: Dict[str, int], results: Dict[str, str]):
+        for status in results.values():
+            if status == 'new':
+                totals['enriched'] += 1
+            elif status == 'failed':
+                totals['failed'] += 1
+
+    def ingest_cards(self, cards: List[dict], known_ids) -> List[str]:
+        """Phase one: store new offers straight from their listing cards, returning each card's status"""
+        statuses = []
+        for card in cards:
+            if card['data_id'] in known_ids:
+                statuses.append('known')
+            elif card['data_id'] and self.flat_offers_manager.save_offer(self.get_card_offer(card)):
+                statuses.append('new')
+            else:
+                statuses.append('unparsed')
+        self.flat_offers_manager.flush()
+        return statuses
+
+    def parse_ads(self) -> Dict[str, int]:
+        """Crawl results pages, storing each page's listing cards and then enriching its new offers"""
+        totals = {'pages': 0, 'new': 0, 'known': 0, 'enriched': 0, 'failed': 0}
+        self.known_streak = 0
+        try:
+            self.resume(totals)
+            while self.max_pages is None or totals['pages'] < self.max_pages:
+                i = totals['pages']
+                totals['pages'] += 1
+                logging.info(f"Processing page {i+1} of listings")
+                self.waiter.until('listing_page', lambda t: self.driver.wait.eles_loaded('@class:truncate_title noprint', timeout=t),
+                                  on_retry=self.driver.refresh)
+                cards = self.get_listing_cards()
+                self.count_resources(self.driver)
+                logging.info(f"Found {len(cards)} offers on page {i+1}")
+                if not cards:
+                    # An empty page ends the listing just like a missing next link
+                    if self.backfill and self.frontier is not None:
+                        self.frontier.clear_cursor(self.target)
+                    break
 
-            logging.info(f"Completed page {i+1}, current URL: {self.driver.url}")
-            logging.info("Navigating to next page")
-            self.driver.ele('tag:a@class:page-link next').click()
+                known_ids = self.flat_offers_manager.get_existing_ids([card['data_id'] for card in cards if card['data_id']])
+                statuses = self.ingest_cards(cards, known_ids)
+                unseen = {card['url']: card['data_id'] for card, status in zip(cards, statuses) if status != 'known'}
+                totals['new'] += statuses.count('new')
+                totals['known'] += statuses.count('known')
+                logging.info(f"Completed page {i+1}: {statuses.count('new')} new offers stored from listing cards, "
+                             f"{statuses.count('known')} already stored, current URL: {self.driver.url}")
+                # Phase two: fill in costs, availability, object details and description before
+                # the next page, so the page's offers are complete within one page's work
+                if unseen:
+                    logging.info(f"Enriching {len(unseen)} offers of page {i+1} from their detail pages")
+                    self.count_enrichment(totals, self.scrape_offers(unseen))
+                if self.backfill and self.frontier is not None:
+                    self.frontier.save_cursor(self.target, self.page_index)
+
+                if not self.backfill and self.reached_known_offers(statuses):
+                    logging.info(f"Found {self.known_streak} consecutive known offers, stopping incremental crawl")
+                    break
+                if not self.next_page():
+                    if self.frontier is not None:
+                        self.frontier.clear_cursor(self.target)
+                    break
+        finally:
+            self.report_extract_times()
+            self.waiter.report()
+            if self.governor is not None:
+                self.governor.report()
+            if self.resource_blocker is not None:
+                self.resource_blocker.report(self.resource_totals, 'run')
+            logging.debug("Closing offer tabs")
+            self.tab_pool.close()
+            if self.http_fetcher is not None:
+                self.http_fetcher.close()
+        logging.info(f"Crawl finished after {totals['pages']} pages: {totals['new']} new, "
+                     f"{totals['known']} known, {totals['enriched']} enriched, {totals['failed']} failed offers")
+        return totals
@@ -0,0 +1,38 @@
+from pymongo import UpdateOne
+from database.database import get_database
+from database.normalize import normalize_offer
+import argparse
+import logging
+import dotenv
+
+dotenv.load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def backfill_normalized_fields(batch_size: int = 500, recompute: bool = False):
+    """Write numeric rent, costs, area and move-in dates to offers stored before they were normalized at ingest"""
+    db = get_database()
+    offers_collection = db['flat_offers']
+    query = {} if recompute else {'total_rent_value': {'$exists': False}}
+    projection = {'data_id': 1, 'total_rent': 1, 'area': 1, 'costs': 1, 'availability': 1}
+
+    operations = []
+    updated = 0
+    for offer in offers_collection.find(query, projection, batch_size=batch_size):
+        operations.append(UpdateOne({'_id': offer['_id']}, {'$set': normalize_offer(offer)}))
+        if len(operations) >= batch_size:
+            updated += offers_collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+            logging.info(f"Normalized {updated} offers so far")
+    if operations:
+        updated += offers_collection.bulk_write(operations, ordered=False).modified_count
+
+    logging.info(f"Backfill finished - normalized fields written to {updated} offers")
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Backfill normalized numeric and date fields of stored offers')
+    arg_parser.add_argument('--batch-size', type=int, default=500)
+    arg_parser.add_argument('--recompute', action='store_true', help='also rewrite offers that already have them')
+    args = arg_parser.parse_args()
+    backfill_normalized_fields(args.batch_size, args.recompute)
@@ -0,0 +1,80 @@
+from typing import Dict, List
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveScheduler:
+    """Sets each target's crawl interval from how fast new offers arrive in its segment
+
+    Arrival rates come from the created_at history of stored offers per
+    (city_id, offer_type_id), smoothed across refreshes. A target is crawled about once
+    per `offers_per_crawl` expected new offers, within [min_interval, max_interval].
+    When the crawls would take more than `budget` of the workers' browser time, every
+    adaptive interval is stretched by the same factor. Pinned targets keep their interval.
+    """
+
+    def __init__(self, flat_offers_manager, workers: int, min_interval: int = 120, max_interval: int = 3600,
+                 offers_per_crawl: float = 3, window_hours: float = 24, budget: float = 0.8,
+                 smoothing: float = 0.5, default_duration: float = 60):
+        self.flat_offers_manager = flat_offers_manager
+        self.workers = workers
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.offers_per_crawl = offers_per_crawl
+        self.window_hours = window_hours
+        self.budget = budget
+        self.smoothing = smoothing
+        self.default_duration = default_duration
+        # New offers per hour, keyed by target key
+        self.rates: Dict[str, float] = {}
+
+    def refresh_rates(self, targets: List) -> bool:
+        """Re-read the arrival counts of the last window, returning False if the query failed"""
+        since = datetime.now() - timedelta(hours=self.window_hours)
+        try:
+            counts = self.flat_offers_manager.get_arrival_counts(since)
+        except Exception as e:
+            logger.warning(f"Failed to read offer arrival counts, keeping previous rates: {str(e)}")
+            return False
+        for target in targets:
+            rate = counts.get((target.city_id, target.offer_type_id), 0) / self.window_hours
+            previous = self.rates.get(target.key)
+            if previous is not None:
+                rate = self.smoothing * rate + (1 - self.smoothing) * previous
+            self.rates[target.key] = rate
+        return True
+
+    def desired_interval(self, rate: float) -> float:
+        if rate <= 0:
+            return self.max_interval
+        interval = self.offers_per_crawl / rate * 3600
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def duration(self, target) -> float:
+        """Browser seconds one crawl of a target takes, from its last run"""
+        return target.status.get('duration') or self.default_duration
+
+    def apply(self, targets: List):
+        """Set the interval and next run of every adaptive target from the current rates"""
+        adaptive = [target for target in targets if not target.pinned]
+        intervals = {target.key: self.desired_interval(self.rates.get(target.key, 0)) for target in adaptive}
+
+        # Share of the workers' time the crawls would keep a browser tab busy
+        pinned_load = sum(self.duration(target) / target.interval for target in targets if target.pinned)
+        adaptive_load = sum(self.duration(target) / intervals[target.key] for target in adaptive)
+        capacity = self.workers * self.budget - pinned_load
+        scale = max(1.0, adaptive_load / capacity) if capacity > 0 else self.max_interval / self.min_interval
+
+        for target in adaptive:
+            target.interval = int(min(self.max_interval, intervals[target.key] * scale))
+            if not target.running and target.last_finished:
+                target.next_run = target.last_finished + target.interval
+                target.status['next_run'] = datetime.fromtimestamp(target.next_run).isoformat()
+            target.status.update({
+                'interval': target.interval,
+                'arrival_rate': round(self.rates.get(target.key, 0), 2)
+            })
+        logger.info(f"Rescheduled {len(adaptive)} targets, browser load {adaptive_load + pinned_load:.2f} "
+                    f"of {self.workers * self.budget:.2f} workers, scale {scale:.2f}: "
+                    + ', '.join(f"{target.key}={target.interval}s" for target in adaptive))
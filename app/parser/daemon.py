@@ -0,0 +1,237 @@
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Event, Lock
+import json
+import os
+import signal
+import time
+import logging
+from DrissionPage import ChromiumPage
+from Parser import Parser
+from crawl_scheduler import AdaptiveScheduler
+from http_fetcher import HttpFetcher
+from liveness import LivenessSweeper
+from search_urls import OFFER_CATEGORIES, CITIES
+from main import (flat_offers_manager, crawl_frontier, resource_blocker, crawl_governor, get_options,
+                  PARSER_WORKERS, PARSER_FETCH_MODE, PARSER_KNOWN_STOP)
+
+logger = logging.getLogger(__name__)
+
+# Number of targets crawled at the same time, each in its own tab of the shared browser
+DAEMON_WORKERS = int(os.getenv('DAEMON_WORKERS', '2'))
+# Default seconds between two crawls of the same target
+DAEMON_INTERVAL = int(os.getenv('DAEMON_INTERVAL', '900'))
+# Per-target overrides as JSON, keyed "<offer_type_id>:<city_id>", e.g. {"0:1": 300}
+DAEMON_TARGET_INTERVALS = json.loads(os.getenv('DAEMON_TARGET_INTERVALS', '{}'))
+DAEMON_STATUS_FILE = os.getenv('DAEMON_STATUS_FILE', 'crawl_status.json')
+# Set DAEMON_ADAPTIVE=0 to crawl every target at its fixed interval
+DAEMON_ADAPTIVE = os.getenv('DAEMON_ADAPTIVE', '1') == '1'
+# Bounds of adaptive intervals, in seconds
+DAEMON_MIN_INTERVAL = int(os.getenv('DAEMON_MIN_INTERVAL', '120'))
+DAEMON_MAX_INTERVAL = int(os.getenv('DAEMON_MAX_INTERVAL', '3600'))
+# Adaptive targets are crawled about once per this many expected new offers
+DAEMON_OFFERS_PER_CRAWL = float(os.getenv('DAEMON_OFFERS_PER_CRAWL', '3'))
+# Hours of created_at history the arrival rates are measured over
+DAEMON_RATE_WINDOW = float(os.getenv('DAEMON_RATE_WINDOW', '24'))
+# Share of the workers' time crawls may keep busy before all adaptive intervals are stretched
+DAEMON_BROWSER_BUDGET = float(os.getenv('DAEMON_BROWSER_BUDGET', '0.8'))
+# Seconds between two recomputations of the adaptive intervals
+DAEMON_RESCHEDULE = int(os.getenv('DAEMON_RESCHEDULE', '600'))
+# Seconds between liveness sweeps of stored offers, 0 to disable them
+SWEEP_INTERVAL = int(os.getenv('SWEEP_INTERVAL', '1800'))
+# Requests one sweep may send
+SWEEP_BUDGET = int(os.getenv('SWEEP_BUDGET', '60'))
+# Seconds before an offer is re-checked, and before a recently notified one is
+SWEEP_RECHECK_AFTER = int(os.getenv('SWEEP_RECHECK_AFTER', str(6*60*60)))
+SWEEP_NOTIFIED_RECHECK_AFTER = int(os.getenv('SWEEP_NOTIFIED_RECHECK_AFTER', str(60*60)))
+
+class CrawlTarget:
+    """One (offer type, city) search that the daemon keeps fresh"""
+
+    def __init__(self, offer_type_id: int, city_id: int, interval: int):
+        self.offer_type_id = offer_type_id
+        self.city_id = city_id
+        self.interval = interval
+        self.next_run = 0.0
+        self.last_finished = 0.0
+        self.running = False
+        # Pinned targets keep their configured interval instead of an adaptive one
+        self.pinned = False
+        self.status: Dict[str, object] = {'interval': interval}
+
+    @property
+    def key(self) -> str:
+        return f"{self.offer_type_id}:{self.city_id}"
+
+def get_targets() -> List[CrawlTarget]:
+    targets = []
+    for offer_type_id in OFFER_CATEGORIES:
+        for city_id in CITIES:
+            target = CrawlTarget(offer_type_id, city_id, DAEMON_INTERVAL)
+            target.interval = int(DAEMON_TARGET_INTERVALS.get(target.key, DAEMON_INTERVAL))
+            target.pinned = target.key in DAEMON_TARGET_INTERVALS or not DAEMON_ADAPTIVE
+            target.status['interval'] = target.interval
+            targets.append(target)
+    return targets
+
+class CrawlDaemon:
+    """Continuously crawls every target on a worker pool sharing one browser process"""
+
+    def __init__(self, targets: List[CrawlTarget], workers: int = DAEMON_WORKERS,
+                 status_file: str = DAEMON_STATUS_FILE):
+        self.targets = targets
+        self.workers = workers
+        self.status_file = status_file
+        self.browser: Optional[ChromiumPage] = None
+        self.lock = Lock()
+        self.stopped = Event()
+        self.scheduler = AdaptiveScheduler(
+            flat_offers_manager, workers, min_interval=DAEMON_MIN_INTERVAL, max_interval=DAEMON_MAX_INTERVAL,
+            offers_per_crawl=DAEMON_OFFERS_PER_CRAWL, window_hours=DAEMON_RATE_WINDOW, budget=DAEMON_BROWSER_BUDGET)
+        self.next_reschedule = 0.0
+        self.sweeper: Optional[LivenessSweeper] = None
+        if SWEEP_INTERVAL > 0:
+            self.sweeper = LivenessSweeper(
+                flat_offers_manager, HttpFetcher(pool_size=1, governor=crawl_governor), budget=SWEEP_BUDGET,
+                recheck_after=SWEEP_RECHECK_AFTER, notified_recheck_after=SWEEP_NOTIFIED_RECHECK_AFTER)
+        self.next_sweep = 0.0
+        self.sweep_status: Dict[str, object] = {}
+
+    def crawl(self, target: CrawlTarget):
+        started = time.time()
+        with self.lock:
+            target.status.update({'running': True, 'last_started': datetime.fromtimestamp(started).isoformat()})
+        self.write_status()
+        tab = None
+        try:
+            tab = self.browser.new_tab()
+            parser = Parser(tab, flat_offers_manager, target.offer_type_id, target.city_id,
+                            workers=PARSER_WORKERS, fetch_mode=PARSER_FETCH_MODE,
+                            known_stop=PARSER_KNOWN_STOP, browser=self.browser,
+                            frontier=crawl_frontier, resource_blocker=resource_blocker,
+                            governor=crawl_governor)
+            totals = parser.parse_ads()
+            flat_offers_manager.flush()
+            error = None
+        except Exception as e:
+            logger.error(f"Crawl of target {target.key} failed: {str(e)}", exc_info=True)
+            totals = {}
+            error = str(e)
+        finally:
+            if tab is not None:
+                try:
+                    tab.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close search tab for target {target.key}: {str(e)}")
+
+        finished = time.time()
+        with self.lock:
+            target.running = False
+            target.last_finished = finished
+            target.next_run = finished + target.interval
+            target.status.update({
+                'running': False,
+                'last_run': datetime.fromtimestamp(finished).isoformat(),
+                'duration': round(finished - started, 1),
+                'new_offers': totals.get('new', 0),
+                'pages': totals.get('pages', 0),
+                'failed_offers': totals.get('failed', 0),
+                'error': error,
+                'next_run': datetime.fromtimestamp(target.next_run).isoformat()
+            })
+        logger.info(f"Target {target.key} done in {finished - started:.0f}s with {totals.get('new', 0)} new offers")
+        self.write_status()
+
+    def write_status(self):
+        """Atomically replace the status file so readers never see a partial write"""
+        with self.lock:
+            status = {target.key: dict(target.status) for target in self.targets}
+        status['governor'] = crawl_governor.state()
+        status['cache'] = flat_offers_manager.cache.stats()
+        status['sweep'] = dict(self.sweep_status)
+        tmp_file = f"{self.status_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(status, f, indent=2)
+            os.replace(tmp_file, self.status_file)
+        except OSError as e:
+            logger.warning(f"Failed to write status file {self.status_file}: {str(e)}")
+
+    def due_targets(self) -> List[CrawlTarget]:
+        """Claim the most overdue targets that are not still running, as many as there are idle workers"""
+        now = time.time()
+        with self.lock:
+            idle = self.workers - sum(1 for target in self.targets if target.running)
+            due = sorted((target for target in self.targets if not target.running and target.next_run <= now),
+                         key=lambda target: target.next_run)[:max(0, idle)]
+            for target in due:
+                target.running = True
+        return due
+
+    def reschedule(self):
+        """Recompute the adaptive intervals from the latest offer arrival rates"""
+        self.next_reschedule = time.time() + DAEMON_RESCHEDULE
+        if all(target.pinned for target in self.targets):
+            return
+        self.scheduler.refresh_rates(self.targets)
+        with self.lock:
+            self.scheduler.apply(self.targets)
+        self.write_status()
+
+    def sweep(self):
+        started = time.time()
+        try:
+            results = self.sweeper.sweep()
+            error = None
+        except Exception as e:
+            logger.error(f"Liveness sweep failed: {str(e)}", exc_info=True)
+            results = {}
+            error = str(e)
+        finished = time.time()
+        self.next_sweep = finished + SWEEP_INTERVAL
+        self.sweep_status = {
+            'last_run': datetime.fromtimestamp(finished).isoformat(),
+            'duration': round(finished - started, 1),
+            'results': results,
+            'error': error,
+            'next_run': datetime.fromtimestamp(self.next_sweep).isoformat()
+        }
+        self.write_status()
+
+    def stop(self, *args):
+        logger.info("Stopping crawl daemon")
+        self.stopped.set()
+
+    def run(self):
+        logger.info(f"Starting crawl daemon for {len(self.targets)} targets with {self.workers} workers")
+        self.browser = ChromiumPage(get_options())
+        try:
+            # The sweep runs in an executor of its own, so it never waits behind crawls
+            # and never takes one of the workers the scheduler's budget counts on
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl') as executor, \
+                    ThreadPoolExecutor(max_workers=1, thread_name_prefix='sweep') as sweep_executor:
+                while not self.stopped.is_set():
+                    if time.time() >= self.next_reschedule:
+                        self.reschedule()
+                    if self.sweeper is not None and time.time() >= self.next_sweep:
+                        # Pushed back until the running sweep sets the real next run
+                        self.next_sweep = float('inf')
+                        sweep_executor.submit(self.sweep)
+                    for target in self.due_targets():
+                        logger.info(f"Scheduling target {target.key}")
+                        executor.submit(self.crawl, target)
+                    self.stopped.wait(1)
+                logger.info("Waiting for running crawls to finish")
+        finally:
+            flat_offers_manager.close()
+            if self.sweeper is not None:
+                self.sweeper.fetcher.close()
+            self.browser.quit()
+            logger.info("Crawl daemon stopped")
+
+if __name__ == "__main__":
+    daemon = CrawlDaemon(get_targets())
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run()
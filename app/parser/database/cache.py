@@ -0,0 +1,167 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+from threading import RLock
+import os
+import sys
+import time
+import logging
+import bson
+
+# Defaults of every manager cache, overridable per process
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '5000'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv('CACHE_TTL', '600'))
+# Misses are remembered for a shorter time, so a document created elsewhere shows up soon
+CACHE_NEGATIVE_TTL = float(os.getenv('CACHE_NEGATIVE_TTL', '60'))
+
+class _NotFound:
+    def __repr__(self):
+        return 'NOT_FOUND'
+
+# Returned by LRUCache.get for keys cached as known misses
+NOT_FOUND = _NotFound()
+
+def document_size(value: Any) -> int:
+    """Approximate memory of a cached document from its BSON size"""
+    try:
+        return len(bson.encode(value))
+    except Exception:
+        return sys.getsizeof(value)
+
+class LRUCache:
+    """Bounded cache evicting the least recently used entries, with expiry and negative caching
+
+    Holds at most max_entries entries and about max_bytes of documents; reads and
+    writes are O(1). Expired entries are dropped when read and by purge_expired().
+    Keys cached with set_missing() read back as NOT_FOUND until negative_ttl passes.
+
+    A database read can finish after a change of its document evicted the key, and
+    would then cache the old document. Callers take a token() before the read and
+    pass it to set(); the value is dropped if the key was deleted, or the cache
+    cleared, after the token was taken.
+    """
+
+    def __init__(self, name: str, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: Optional[int] = CACHE_MAX_BYTES,
+                 ttl: float = CACHE_TTL, negative_ttl: float = CACHE_NEGATIVE_TTL,
+                 sizeof: Callable[[Any], int] = document_size):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.sizeof = sizeof
+        # key -> (value, expires_at, size), least recently used first
+        self.entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self.bytes = 0
+        self.lock = RLock()
+        # Bumped by every delete() and clear(); deleted keys -> generation of their last delete, oldest first
+        self.generation = 0
+        self.deleted: 'OrderedDict[Hashable, int]' = OrderedDict()
+        # Tokens older than this cannot be checked against self.deleted any more
+        self.oldest_checkable = 0
+        self.counters: Dict[str, int] = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                                         'stale_writes': 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh cached value, NOT_FOUND for a cached miss, or default"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return default
+            self.entries.move_to_end(key)
+            self.counters['negative_hits' if value is NOT_FOUND else 'hits'] += 1
+            return value
+
+    def token(self) -> int:
+        """Taken before reading a document from the database, to pass to set() afterwards"""
+        with self.lock:
+            return self.generation
+
+    def is_stale(self, key: Hashable, token: int) -> bool:
+        """Whether the key was deleted, or the cache cleared, after the token was taken"""
+        with self.lock:
+            return token < self.oldest_checkable or self.deleted.get(key, -1) > token
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, token: Optional[int] = None):
+        size = self.sizeof(value) if self.max_bytes is not None and value is not NOT_FOUND else 0
+        with self.lock:
+            if token is not None and self.is_stale(key, token):
+                # The document changed while it was being read; the next read gets the new one
+                self.counters['stale_writes'] += 1
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size)
+            self.bytes += size
+            while self.entries and (len(self.entries) > self.max_entries
+                                    or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.counters['evictions'] += 1
+
+    def set_missing(self, key: Hashable, token: Optional[int] = None):
+        """Remember that a key has no document"""
+        self.set(key, NOT_FOUND, self.negative_ttl, token)
+
+    def delete(self, key: Hashable):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.generation += 1
+            self.deleted[key] = self.generation
+            self.deleted.move_to_end(key)
+            # Bounded like the entries; tokens from before the forgotten deletes count as stale
+            while len(self.deleted) > self.max_entries:
+                forgotten, generation = self.deleted.popitem(last=False)
+                self.oldest_checkable = generation
+
+    def _remove(self, key: Hashable):
+        value, expires_at, size = self.entries.pop(key)
+        self.bytes -= size
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether a fresh document is cached for key; does not count as a hit or move the entry"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and entry[0] is not NOT_FOUND and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.generation += 1
+            self.deleted.clear()
+            self.oldest_checkable = self.generation
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry, returning how many were dropped"""
+        now = time.monotonic()
+        with self.lock:
+            expired = [key for key, (value, expires_at, size) in self.entries.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.counters['expirations'] += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['negative_hits'] + self.counters['misses']
+            hit_rate = (self.counters['hits'] + self.counters['negative_hits']) / lookups if lookups else 0.0
+            return dict(self.counters, entries=len(self.entries), bytes=self.bytes, hit_rate=round(hit_rate, 3))
+
+    def report(self):
+        stats = self.stats()
+        logging.info(f"Cache {self.name}: {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB, "
+                     f"hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['negative_hits']} negative hits, "
+                     f"{stats['misses']} misses), {stats['evictions']} evictions, {stats['expirations']} expirations, "
+                     f"{stats['stale_writes']} stale writes dropped")
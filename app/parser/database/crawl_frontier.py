@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import logging
+from pymongo import UpdateOne
+from database.database import get_database
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class CrawlFrontier:
+    """Persisted crawl state: offer URLs still to scrape and each target's page cursor
+
+    Offer URLs are added before their tabs open and removed once scraped, so a
+    restarted parser picks up whatever a crash left behind. Failed URLs are retried
+    with capped exponential backoff until max_attempts, then kept as 'failed'.
+    """
+
+    def __init__(self, max_attempts: int = 6, base_delay: int = 60, max_delay: int = 3600):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @property
+    def db(self):
+        return get_database()
+
+    @property
+    def frontier_collection(self):
+        return self.db['crawl_frontier']
+
+    @property
+    def cursors_collection(self):
+        return self.db['crawl_cursors']
+
+    def add(self, target: str, offer_ids: Dict[str, Optional[str]]):
+        """Record offer URLs (mapped to their data_id, if known) as pending for a target"""
+        if not offer_ids:
+            return
+        now = datetime.now()
+        operations = [UpdateOne(
+            {'url': url},
+            {'$setOnInsert': {
+                'url': url,
+                'data_id': data_id,
+                'target': target,
+                'status': 'pending',
+                'attempts': 0,
+                'last_error': None,
+                'next_attempt_at': now,
+                'created_at': now
+            }},
+            upsert=True
+        ) for url, data_id in offer_ids.items()]
+        self.frontier_collection.bulk_write(operations, ordered=False)
+
+    def due(self, target: str, limit: int = 100) -> Dict[str, Optional[str]]:
+        """Return pending URLs of a target whose retry time has come, mapped to their data_id"""
+        cursor = self.frontier_collection.find(
+            {'target': target, 'status': 'pending', 'next_attempt_at': {'$lte': datetime.now()}},
+            {'url': 1, 'data_id': 1, '_id': 0},
+            sort=[('next_attempt_at', 1)]
+        ).limit(limit)
+        return {entry['url']: entry.get('data_id') for entry in cursor}
+
+    def complete(self, urls: List[str]):
+        if urls:
+            self.frontier_collection.delete_many({'url': {'$in': urls}})
+
+    def fail(self, url: str, error: str):
+        """Schedule a retry with capped exponential backoff, or give up after max_attempts"""
+        entry = self.frontier_collection.find_one_and_update(
+            {'url': url},
+            {'$inc': {'attempts': 1}, '$set': {'last_error': error, 'updated_at': datetime.now()}},
+            projection={'attempts': 1},
+            return_document=True
+        )
+        if entry is None:
+            return
+        attempts = entry['attempts']
+        if attempts >= self.max_attempts:
+            logging.warning(f"Giving up on {url} after {attempts} attempts: {error}")
+            self.frontier_collection.update_one({'url': url}, {'$set': {'status': 'failed'}})
+            return
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        self.frontier_collection.update_one(
+            {'url': url},
+            {'$set': {'next_attempt_at': datetime.now() + timedelta(seconds=delay)}}
+        )
+        logging.info(f"Retrying {url} in {delay}s (attempt {attempts}/{self.max_attempts})")
+
+    def get_cursor(self, target: str) -> Optional[int]:
+        """Return the last completed results page of an interrupted backfill, if any"""
+        cursor = self.cursors_collection.find_one({'target': target})
+        return cursor['page'] if cursor else None
+
+    def save_cursor(self, target: str, page: int):
+        self.cursors_collection.update_one(
+            {'target': target},
+            {'$set': {'page': page, 'updated_at': datetime.now()}},
+            upsert=True
+        )
+
+    def clear_cursor(self, target: str):
+        self.cursors_collection.delete_one({'target': target})
@@ -1,54 +1,72 @@
-from typing import Dict, Optional, List
-import time
+from typing import Dict, Optional, List, Set, Tuple
 from datetime import datetime, timedelta
-from decimal import Decimal
-from database.database import create_database, validate_flat_offer
+from threading import Lock
+from pymongo import UpdateOne
+from database.database import get_database, validate_flat_offer
+from database.offer_writer import BulkOfferWriter
+from database.normalize import normalize_offer
+from database.cache import LRUCache, NOT_FOUND
+from database.views import ID_VIEW, CARD_VIEW, DETAIL_VIEW, LIVENESS_VIEW
+from database.models import Offer, to_document
 
 
-db = create_database()
-
-if db is None:
-    print("Database not initialized")
-    exit(1)
-
 class FlatOffersManager:
     def __init__(self):
-        self.db = db
-        self.offers_collection = self.db['flat_offers']
-        self.cached_offers: Dict[str, dict] = {}
-        self.last_access: Dict[str, float] = {}
-        self.cache_duration = 600  # 10 minutes in seconds
+        self.cache = LRUCache('flat_offers')
+        # Created with the first queued write, so building the manager does not connect
+        self._writer: Optional[BulkOfferWriter] = None
+        self._writer_lock = Lock()
+
+    @property
+    def db(self):
+        return get_database()
+
+    @property
+    def offers_collection(self):
+        return self.db['flat_offers']
 
-    def get_offer(self, data_id: str) -> Optional[dict]:
-        current_time = time.time()
+    @property
+    def writer(self) -> BulkOfferWriter:
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = BulkOfferWriter(self.offers_collection)
+        return self._writer
 
+    def get_offer(self, data_id: str) -> Optional[Offer]:
         # Check if offer is in cache and still fresh
-        if data_id in self.cached_offers:
-            if current_time - self.last_access[data_id] < self.cache_duration:
-                self.last_access[data_id] = current_time
-                return self.cached_offers[data_id]
-            else:
-                # Remove expired cache
-                del self.cached_offers[data_id]
-                del self.last_access[data_id]
+        offer = self.cache.get(data_id)
+        if offer is NOT_FOUND:
+            return None
+        if offer is not None:
+            return offer
 
         # Get from database
-        offer = self.offers_collection.find_one({'data_id': data_id})
+        token = self.cache.token()
+        offer = Offer.from_document(self.offers_collection.find_one({'data_id': data_id}, DETAIL_VIEW))
         if offer:
-            self.cached_offers[data_id] = offer
-            self.last_access[data_id] = current_time
+            self.cache.set(data_id, offer, token=token)
             return offer
+        self.cache.set_missing(data_id, token)
         return None
 
+    def get_existing_ids(self, data_ids: List[str]) -> Set[str]:
+        """Return which of the given data_ids are already stored, using a single query"""
+        existing = {data_id for data_id in data_ids if data_id in self.cache}
+        missing = [data_id for data_id in data_ids if data_id not in existing]
+        if missing:
+            cursor = self.offers_collection.find({'data_id': {'$in': missing}}, ID_VIEW)
+            existing.update(offer['data_id'] for offer in cursor)
+        return existing
+
     def save_offer(self, offer_data: dict):
-        """Save a new flat offer if it doesn't already exist"""
+        """Queue a new flat offer for the next bulk write; existing offers are left untouched"""
         data_id: str = offer_data['data_id']
         if not validate_flat_offer(offer_data):
             print("Invalid offer data")
             return False
-        # Check if the offer already exists
-        existing_offer = self.get_offer(data_id)
-        if existing_offer:
+        # Offers seen in this process are cached; the database keeps existing ones via $setOnInsert
+        if data_id in self.cache:
             return False # Exit if the offer already exists
 
         # Ensure required fields
@@ -58,17 +76,52 @@ class FlatOffersManager:
             offer_data['availability'] = {
                 'listed_at': datetime.now()
             }
+        offer_data.update(normalize_offer(offer_data))
         # Update cache
-        self.cached_offers[data_id] = offer_data
-        self.last_access[data_id] = time.time()
+        self.cache.set(data_id, Offer.from_document(offer_data))
 
-        # Update database
-        self.offers_collection.update_one(
+        # Queue database write
+        self.writer.add(UpdateOne(
             {'data_id': data_id},
-            {'$set': offer_data},
+            {'$setOnInsert': offer_data},
             upsert=True
-        )
+        ))
         return True # Return True if the offer was saved
+
+    def enrich_offer(self, offer_data: dict):
+        """Queue the detail-page fields of an offer, inserting it if its listing card was never stored"""
+        data_id: str = offer_data['data_id']
+        if not validate_flat_offer(offer_data):
+            print("Invalid offer data")
+            return False
+        details = {key: value for key, value in offer_data.items() if key not in ('is_active', 'created_at')}
+        details.update(normalize_offer(details))
+        details['details_parsed'] = True
+        details['enriched_at'] = datetime.now()
+
+        # Update cache
+        cached = self.cache.get(data_id)
+        cached = cached.to_document() if isinstance(cached, Offer) else {}
+        cached.update(details)
+        self.cache.set(data_id, Offer.from_document(cached))
+
+        # Queue database write
+        self.writer.add(UpdateOne(
+            {'data_id': data_id},
+            {'$set': details, '$setOnInsert': {'is_active': True, 'created_at': datetime.now()}},
+            upsert=True
+        ))
+        return True
+
+    def flush(self):
+        """Write queued offers now"""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """Flush queued offers and stop the background writer"""
+        if self._writer is not None:
+            self._writer.close()
     def deactivate_offer(self, data_id: str):
         """Mark an offer as inactive"""
         offer = self.get_offer(data_id)
@@ -79,21 +132,17 @@ class FlatOffersManager:
                 {'$set': {'is_active': False}}
             )
             # Remove from cache
-            if data_id in self.cached_offers:
-                del self.cached_offers[data_id]
-                del self.last_access[data_id]
+            self.cache.delete(data_id)
 
     def delete_offer(self, data_id: str):
         """Permanently delete an offer"""
         # Remove from cache
-        if data_id in self.cached_offers:
-            del self.cached_offers[data_id]
-            del self.last_access[data_id]
+        self.cache.delete(data_id)
 
         # Remove from database
         self.offers_collection.delete_one({'data_id': data_id})
 
-    def find_matching_offers(self, user_settings: dict) -> List[dict]:
+    def find_matching_offers(self, user_settings: dict) -> List[Offer]:
         """Find offers matching user preferences"""
         query = {'is_active': True}
 
@@ -103,7 +152,13 @@ class FlatOffersManager:
 
         # Add price range filter if specified
         if user_settings.get('max_price'):
-            query['costs.base_rent'] = {'$lte': Decimal(str(user_settings['max_price']))}
+            query['total_rent_value'] = {'$lte': float(user_settings['max_price'])}
+
+        # Add size and move-in filters if specified
+        if user_settings.get('min_area'):
+            query['area_value'] = {'$gte': float(user_settings['min_area'])}
+        if user_settings.get('move_in_by'):
+            query['available_from'] = {'$lte': user_settings['move_in_by']}
 
         # Add furnished filter if specified
         if user_settings.get('furnished') is not None:
@@ -116,10 +171,58 @@ class FlatOffersManager:
         # Find matching offers
         offers = self.offers_collection.find(
             query,
+            CARD_VIEW,
             sort=[('availability.listed_at', -1)]  # Sort by newest first
         ).limit(10)  # Limit to 10 results
 
-        return list(offers)
+        return Offer.from_documents(offers)
+
+    def get_arrival_counts(self, since: datetime) -> Dict[Tuple[int, int], int]:
+        """Count offers first stored since a time, per (city_id, offer_type_id)"""
+        pipeline = [
+            {'$match': {'created_at': {'$gte': since}, 'city_id': {'$exists': True}}},
+            {'$group': {'_id': {'city_id': '$city_id', 'offer_type_id': '$offer_type_id'}, 'count': {'$sum': 1}}}
+        ]
+        return {
+            (group['_id']['city_id'], group['_id']['offer_type_id']): group['count']
+            for group in self.offers_collection.aggregate(pipeline)
+        }
+
+    def get_offers_to_recheck(self, limit: int, checked_before: datetime, notified_since: datetime,
+                              notified_checked_before: datetime) -> List[Offer]:
+        """Active offers due for a liveness check, recently notified ones first, then the longest unchecked"""
+        query = {'is_active': True, 'details_parsed': {'$ne': False}}
+        offers = list(self.offers_collection.find(
+            dict(query, notified_at={'$gte': notified_since},
+                 **{'liveness.checked_at': {'$not': {'$gte': notified_checked_before}}}),
+            LIVENESS_VIEW,
+            sort=[('notified_at', -1)]
+        ).limit(limit))
+        if len(offers) < limit:
+            offers += self.offers_collection.find(
+                dict(query, data_id={'$nin': [offer['data_id'] for offer in offers]},
+                     **{'liveness.checked_at': {'$not': {'$gte': checked_before}}}),
+                LIVENESS_VIEW,
+                sort=[('liveness.checked_at', 1)]
+            ).limit(limit - len(offers))
+        return Offer.from_documents(offers)
+
+    def record_check(self, data_id: str, liveness: dict, updates: Optional[dict] = None,
+                     changes: Optional[List[dict]] = None):
+        """Queue the result of a liveness check, with refreshed fields and a change log entry if it changed"""
+        update = {'$set': dict(updates or {}, liveness=liveness)}
+        if changes:
+            update['$push'] = {'changes': {'$each': changes, '$slice': -50}}
+        self.writer.add(UpdateOne({'data_id': data_id}, update))
+        self.cache.delete(data_id)
+
+    def mark_removed(self, data_id: str, liveness: dict):
+        """Queue the deactivation of an offer that disappeared from the site"""
+        self.writer.add(UpdateOne(
+            {'data_id': data_id},
+            {'$set': {'is_active': False, 'removed_at': datetime.now(), 'liveness': liveness}}
+        ))
+        self.cache.delete(data_id)
 
     def get_active_offers_count(self) -> int:
         """Get count of active offers"""
@@ -133,24 +236,26 @@ class FlatOffersManager:
         old_offers = self.offers_collection.find({
             'is_active': True,
             'availability.listed_at': {'$lt': cutoff_date}
-        })
+        }, ID_VIEW)
 
         for offer in old_offers:
             self.deactivate_offer(offer['data_id'])
 
-    def get_offers_by_price_range(self, min_price: float, max_price: float) -> List[dict]:
+    def get_offers_by_price_range(self, min_price: float, max_price: float) -> List[Offer]:
         """Get active offers within price range"""
         query = {
             'is_active': True,
-            'costs.base_rent': {
-                '$gte': Decimal(str(min_price)),
-                '$lte': Decimal(str(max_price))
+            'total_rent_value': {
+                '$gte': float(min_price),
+                '$lte': float(max_price)
             }
         }
+        return Offer.from_documents(self.offers_collection.find(query, CARD_VIEW, sort=[('total_rent_value', 1)]))
+
     def update_offer_data(self, data_id: str, updated_data: dict) -> bool:
         """Update offer data by data_id"""
         result = self.offers_collection.update_one(
             {'data_id': data_id},
-            {'$set': updated_data}
+            {'$set': to_document(updated_data)}
         )
         return result.modified_count > 0
@@ -0,0 +1,65 @@
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime
+import re
+
+# German number format: '1.250 €', '12,5 m²', '650€'
+NUMBER_PATTERN = re.compile(r'\d[\d.]*(?:,\d+)?')
+DATE_PATTERN = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})')
+
+# Availability labels of the detail page ('frei ab: ') and the English site version
+FROM_LABELS = ['frei ab', 'available from']
+TO_LABELS = ['frei bis', 'available until', 'available to']
+
+def parse_number(text: Any) -> Optional[float]:
+    """Parse the first number in a price or area string, None if there is none"""
+    if isinstance(text, (int, float)):
+        return float(text)
+    if not text:
+        return None
+    match = NUMBER_PATTERN.search(str(text))
+    if not match:
+        return None
+    return float(match.group(0).replace('.', '').replace(',', '.'))
+
+def parse_date(text: Any) -> Optional[datetime]:
+    if isinstance(text, datetime):
+        return text
+    match = DATE_PATTERN.search(str(text or ''))
+    if not match:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
+def parse_availability(availability: Any) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Move-in and move-out dates from detail-page labels or a listing card's 'dd.mm.yyyy - dd.mm.yyyy'"""
+    if not isinstance(availability, dict):
+        return None, None
+    available_from = available_to = None
+    for label, value in availability.items():
+        label = str(label).lower()
+        if any(name in label for name in FROM_LABELS):
+            available_from = parse_date(value)
+        elif any(name in label for name in TO_LABELS):
+            available_to = parse_date(value)
+    if available_from is None and availability.get('listing_dates'):
+        dates = [parse_date(part) for part in str(availability['listing_dates']).split('-')]
+        available_from = dates[0]
+        available_to = dates[1] if len(dates) > 1 else None
+    return available_from, available_to
+
+def normalize_offer(offer: dict) -> Dict[str, Any]:
+    """Numeric rent, costs and area plus move-in dates, stored next to the raw strings for range queries"""
+    costs = offer.get('costs') if isinstance(offer.get('costs'), dict) else {}
+    # A bare '0' is the default of get_flat_offer_fields(), not a parsed price
+    costs_values = {key: parse_number(text) for key, text in costs.items() if text != '0'}
+    available_from, available_to = parse_availability(offer.get('availability'))
+    return {
+        'total_rent_value': parse_number(offer.get('total_rent')),
+        'area_value': parse_number(offer.get('area')),
+        'costs_values': {key: value for key, value in costs_values.items() if value is not None},
+        'available_from': available_from,
+        'available_to': available_to
+    }
@@ -0,0 +1,86 @@
+from typing import List
+from threading import Event, Lock, Thread
+import time
+import logging
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class BulkOfferWriter:
+    """Write-behind buffer flushing offer upserts with unordered bulk_write
+
+    A flush happens once max_batch operations are queued, once the oldest queued
+    operation is max_delay seconds old, and on close().
+    """
+
+    def __init__(self, collection: Collection, max_batch: int = 50, max_delay: float = 5.0):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.buffer: List[UpdateOne] = []
+        self.oldest = 0.0
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        self.batch_sizes: List[int] = []
+        self.flush_latencies: List[float] = []
+        self.stopped = Event()
+        self.flusher = Thread(target=self._flush_periodically, name='offer-writer', daemon=True)
+        self.flusher.start()
+
+    def add(self, operation: UpdateOne):
+        with self.lock:
+            if not self.buffer:
+                self.oldest = time.monotonic()
+            self.buffer.append(operation)
+            full = len(self.buffer) >= self.max_batch
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all queued operations, returning how many were sent"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.buffer = self.buffer, []
+            if not batch:
+                return 0
+            start = time.monotonic()
+            try:
+                result = self.collection.bulk_write(batch, ordered=False)
+                logging.debug(f"Bulk write: {result.upserted_count} upserted, {result.modified_count} modified")
+            except BulkWriteError as e:
+                logging.error(f"Bulk write of {len(batch)} offers had {len(e.details.get('writeErrors', []))} errors")
+            except Exception as e:
+                logging.error(f"Bulk write of {len(batch)} offers failed, requeueing: {str(e)}")
+                with self.lock:
+                    self.buffer = batch + self.buffer
+                    self.oldest = time.monotonic()
+                return 0
+            latency = time.monotonic() - start
+            self.batch_sizes.append(len(batch))
+            self.flush_latencies.append(latency)
+            logging.info(f"Flushed {len(batch)} offers in {latency * 1000:.1f} ms")
+            return len(batch)
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(min(1.0, self.max_delay)):
+            with self.lock:
+                due = self.buffer and time.monotonic() - self.oldest >= self.max_delay
+            if due:
+                self.flush()
+
+    def report(self):
+        if not self.batch_sizes:
+            return
+        flushes = len(self.batch_sizes)
+        logging.info(f"Offer writer: {sum(self.batch_sizes)} offers in {flushes} flushes, "
+                     f"avg batch {sum(self.batch_sizes) / flushes:.1f}, "
+                     f"avg latency {sum(self.flush_latencies) / flushes * 1000:.1f} ms, "
+                     f"max latency {max(self.flush_latencies) * 1000:.1f} ms")
+
+    def close(self):
+        self.stopped.set()
+        self.flush()
+        self.report()
@@ -0,0 +1,21 @@
+# Named projections of flat_offers documents, so each query loads only the fields its caller reads.
+# The bot and the parser keep identical copies of this module.
+
+# Existence checks; covered by the data_id_unique index
+ID_VIEW = {'_id': 0, 'data_id': 1}
+
+# Matching offers against finders; covered by the active_city_type_parsed_match index,
+# so the server answers from the index without fetching documents. details_parsed tells
+# offers stored from a listing card alone, which are matched again once enriched
+MATCH_VIEW = {'_id': 0, 'data_id': 1, 'city_id': 1, 'offer_type_id': 1, 'details_parsed': 1, 'address': 1}
+
+# An offer in a list or a notification; card-only offers (details_parsed false) have all of these
+CARD_VIEW = {'_id': 0, 'data_id': 1, 'name': 1, 'address': 1, 'total_rent': 1, 'area': 1, 'link': 1}
+
+# The offer details page: everything except the image list and the parser's bookkeeping,
+# including details_parsed and enriched_at
+DETAIL_VIEW = {'_id': 0, 'images': 0, 'liveness': 0, 'changes': 0}
+
+# Re-checking an offer for removals and changes
+LIVENESS_VIEW = {'_id': 0, 'data_id': 1, 'link': 1, 'offer_type_id': 1, 'city_id': 1,
+                 'total_rent': 1, 'costs': 1, 'availability': 1, 'liveness': 1}
@@ -0,0 +1,161 @@
+from typing import Dict
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Condition
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Text of block and CAPTCHA pages; only checked when a page lacks the content the parser expects
+CHALLENGE_MARKERS = ['g-recaptcha', 'captcha-delivery', 'cf-challenge', 'challenge-form',
+                     'Zugriff verweigert', 'Access denied', 'Too Many Requests']
+CHALLENGE_STATUS_CODES = [403, 429]
+# Removed offers; an expected answer, not a sign of overload
+GONE_STATUS_CODES = [404, 410]
+
+def looks_like_challenge(html: str) -> bool:
+    return any(marker in html for marker in CHALLENGE_MARKERS)
+
+class GovernedRequest:
+    """Outcome of one request made under the governor; anything not marked otherwise is 'ok' or 'slow'"""
+
+    def __init__(self):
+        self.outcome = None
+
+    def ok(self):
+        """The server answered normally, even if the block goes on to raise, e.g. a 404 of a removed offer"""
+        self.outcome = 'ok'
+
+    def fail(self):
+        self.outcome = 'error'
+
+    def challenge(self):
+        self.outcome = 'challenge'
+
+class CrawlGovernor:
+    """Token bucket and adaptive concurrency limit shared by every request the parser sends
+
+    Requests start at most `rate` per second (bursts of up to `burst`) with at most
+    `concurrency` in flight. Slow responses halve the concurrency, errors (5xx and
+    failed connections) also halve the rate, and challenge pages (403, 429 and block
+    pages) additionally pause all requests for an exponentially growing backoff.
+    Other 4xx answers, such as the 404/410 of removed offers, count as good responses.
+    Every `recover_after` consecutive good responses add one slot and a tenth of the
+    configured rate back.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 3, max_concurrency: int = 4, min_rate: float = 0.05,
+                 slow_after: float = 10.0, backoff: float = 30.0, max_backoff: float = 900.0, recover_after: int = 20):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.refilled = time.monotonic()
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = self.max_concurrency
+        self.active = 0
+        self.slow_after = slow_after
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self.backoff = 0.0
+        self.paused_until = 0.0
+        self.recover_after = recover_after
+        self.good_streak = 0
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.condition = Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def acquire(self):
+        """Block until a token and a concurrency slot are free and no backoff is running"""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.active >= self.concurrency:
+                    delay = 1.0
+                elif self.tokens < 1:
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.active += 1
+                    return
+                self.condition.wait(delay)
+
+    def release(self, outcome: str):
+        with self.condition:
+            self.active -= 1
+            self._record(outcome)
+            self.condition.notify_all()
+
+    def _record(self, outcome: str):
+        self.counts[outcome] += 1
+        if outcome == 'ok':
+            self.good_streak += 1
+            if self.good_streak >= self.recover_after:
+                self.good_streak = 0
+                self.backoff = 0.0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+            return
+        self.good_streak = 0
+        self.concurrency = max(1, self.concurrency // 2)
+        if outcome in ('error', 'challenge'):
+            self.rate = max(self.min_rate, self.rate / 2)
+        if outcome == 'challenge':
+            self.backoff = min(self.max_backoff, self.backoff * 2 if self.backoff else self.base_backoff)
+            self.paused_until = time.monotonic() + self.backoff
+            logging.warning(f"Challenge page detected, pausing all requests for {self.backoff:.0f}s")
+        logging.info(f"Governor slowed down after {outcome} response: "
+                     f"{self.rate:.2f} req/s, concurrency {self.concurrency}")
+
+    def challenge(self):
+        """Record a challenge page found after its request was already released"""
+        with self.condition:
+            self._record('challenge')
+            self.condition.notify_all()
+
+    @contextmanager
+    def request(self):
+        """Pace one request, classifying it by how it went once the block exits"""
+        self.acquire()
+        request = GovernedRequest()
+        start = time.monotonic()
+        try:
+            yield request
+        except Exception:
+            if request.outcome is None:
+                request.fail()
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            outcome = request.outcome or ('slow' if elapsed > self.slow_after else 'ok')
+            self.release(outcome)
+
+    def state(self) -> Dict[str, object]:
+        with self.condition:
+            self._refill(time.monotonic())
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'concurrency': self.concurrency,
+                'max_concurrency': self.max_concurrency,
+                'active': self.active,
+                'tokens': round(self.tokens, 2),
+                'backoff': self.backoff,
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 1),
+                'responses': dict(self.counts)
+            }
+
+    def report(self):
+        state = self.state()
+        logging.info(f"Governor: {state['rate']} of {state['max_rate']} req/s, concurrency "
+                     f"{state['concurrency']}/{state['max_concurrency']}, backoff {state['backoff']:.0f}s, "
+                     f"responses {state['responses']}")
@@ -0,0 +1,98 @@
+from typing import Dict, Optional, Tuple
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from DrissionPage.common import make_session_ele
+from governor import CHALLENGE_STATUS_CODES, CrawlGovernor, GovernedRequest
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/124.0 Safari/537.36')
+
+class StaticPage:
+    """Server-rendered page parsed into a static element tree with the ChromiumPage lookup API"""
+
+    def __init__(self, url: str, html: str):
+        self.url = url
+        self.html = html
+        self.root = make_session_ele(html)
+
+    @classmethod
+    def from_page(cls, page) -> 'StaticPage':
+        """Snapshot a live tab with a single DevTools call so lookups run locally"""
+        if isinstance(page, cls):
+            return page
+        return cls(page.url, page.html)
+
+    def ele(self, locator, index: int = 1, timeout: Optional[float] = None):
+        return self.root.ele(locator, index=index)
+
+    def eles(self, locator, timeout: Optional[float] = None):
+        return self.root.eles(locator)
+
+class HttpFetcher:
+    """Pooled HTTP client fetching offer pages without a browser"""
+
+    def __init__(self, pool_size: int = 8, timeout: float = 15, governor: Optional[CrawlGovernor] = None):
+        self.timeout = timeout
+        self.governor = governor
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Language': 'de-DE,de;q=0.9,en;q=0.8',
+        })
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch(self, url: str) -> StaticPage:
+        """Fetch a page and parse it, raising on HTTP errors"""
+        logging.debug(f"Fetching URL over HTTP: {url}")
+        if self.governor is None:
+            return self._fetch(url, GovernedRequest())
+        with self.governor.request() as request:
+            return self._fetch(url, request)
+
+    @staticmethod
+    def classify(status_code: int, request: GovernedRequest):
+        """Tell the governor how a response went; 2xx and 3xx are left to its timing"""
+        if status_code in CHALLENGE_STATUS_CODES:
+            request.challenge()
+        elif status_code >= 500:
+            request.fail()
+        elif status_code >= 400:
+            # e.g. 404/410 of removed offers; raising on them must not slow the crawl down
+            request.ok()
+
+    def _fetch(self, url: str, request: GovernedRequest) -> StaticPage:
+        response = self.session.get(url, timeout=self.timeout)
+        self.classify(response.status_code, request)
+        response.raise_for_status()
+        return StaticPage(response.url, response.text)
+
+    def revalidate(self, url: str, etag: Optional[str] = None,
+                   last_modified: Optional[str] = None) -> Tuple[int, Optional[StaticPage], Dict[str, Optional[str]]]:
+        """Conditionally re-fetch a page, returning its status, the page (only on 200) and its validators"""
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        if self.governor is None:
+            return self._revalidate(url, headers, GovernedRequest())
+        with self.governor.request() as request:
+            return self._revalidate(url, headers, request)
+
+    def _revalidate(self, url: str, headers: Dict[str, str], request: GovernedRequest):
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        self.classify(response.status_code, request)
+        validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        page = StaticPage(response.url, response.text) if response.status_code == 200 else None
+        return response.status_code, page, validators
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,157 @@
+from typing import Dict, List, Tuple
+from collections import defaultdict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import time
+import logging
+from http_fetcher import HttpFetcher
+from governor import GONE_STATUS_CODES, looks_like_challenge
+from Parser import Parser, offer_id_from_url
+from database.normalize import normalize_offer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Extracted fields the content hash covers; a changed hash refreshes them all
+HASHED_FIELDS = ['name', 'total_rent', 'area', 'costs', 'address', 'availability', 'object_details', 'description']
+# Fields whose changes are logged in the offer's 'changes' list
+TRACKED_FIELDS = ['total_rent', 'costs', 'availability']
+
+def content_hash(data: dict) -> str:
+    content = {field: data.get(field) for field in HASHED_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class LivenessSweeper:
+    """Re-checks stored active offers, deactivating removed ones and logging rent and availability changes
+
+    A sweep sends at most `budget` requests. Offers notified to users within
+    `notified_window` are checked first, every `notified_recheck_after` seconds; the
+    rest are checked in order of their last check, every `recheck_after` seconds.
+    Conditional requests reuse the ETag and Last-Modified of the previous check.
+    An offer is deactivated on 404/410, or after `missing_limit` checks in a row
+    that find no offer on its page. Failed checks are recorded too, so they wait
+    for the next recheck like any other.
+    """
+
+    def __init__(self, flat_offers_manager, fetcher: HttpFetcher, budget: int = 60, recheck_after: int = 6*60*60,
+                 notified_window: int = 3*24*60*60, notified_recheck_after: int = 60*60, missing_limit: int = 2):
+        self.flat_offers_manager = flat_offers_manager
+        self.fetcher = fetcher
+        self.budget = budget
+        self.recheck_after = recheck_after
+        self.notified_window = notified_window
+        self.notified_recheck_after = notified_recheck_after
+        self.missing_limit = missing_limit
+        self.parsers: Dict[Tuple[int, int], Parser] = {}
+
+    def parser_for(self, offer: dict) -> Parser:
+        """Offline parser for the offer's type and city, reused across sweeps"""
+        key = (offer.get('offer_type_id', 0), offer.get('city_id', 0))
+        if key not in self.parsers:
+            self.parsers[key] = Parser(None, None, key[0], key[1], workers=1, open_search=False)
+        return self.parsers[key]
+
+    def record_failure(self, offer: dict, status, error: str):
+        """Record a check that learned nothing, keeping the previous result
+
+        Setting checked_at moves the offer to the back of the queue, so offers that keep
+        failing wait their recheck interval instead of taking every sweep's budget.
+        """
+        previous = offer.get('liveness') or {}
+        liveness = dict(previous, checked_at=datetime.now(), status=status, error=error,
+                        failures=previous.get('failures', 0) + 1)
+        self.flat_offers_manager.record_check(offer['data_id'], liveness)
+
+    def check(self, offer: dict) -> str:
+        """Re-fetch one offer and record what changed, returning the outcome"""
+        data_id = offer['data_id']
+        previous = offer.get('liveness') or {}
+        now = datetime.now()
+        status, page, validators = self.fetcher.revalidate(offer['link'], previous.get('etag'),
+                                                           previous.get('last_modified'))
+        liveness = {
+            'checked_at': now,
+            'status': status,
+            'etag': validators['etag'] or previous.get('etag'),
+            'last_modified': validators['last_modified'] or previous.get('last_modified'),
+            'content_hash': previous.get('content_hash'),
+            'missing': 0
+        }
+        if status == 304:
+            self.flat_offers_manager.record_check(data_id, liveness)
+            return 'not_modified'
+        if status in GONE_STATUS_CODES:
+            logging.info(f"Offer {data_id} is gone ({status}), deactivating")
+            self.flat_offers_manager.mark_removed(data_id, liveness)
+            return 'removed'
+        if page is None:
+            # Throttled or a server error
+            self.record_failure(offer, status, f"HTTP {status}")
+            return 'failed'
+
+        if offer_id_from_url(page.url) != data_id or not page.ele('tag:div@id=main_column'):
+            if looks_like_challenge(page.html):
+                if self.fetcher.governor is not None:
+                    self.fetcher.governor.challenge()
+                self.record_failure(offer, status, 'challenge page')
+                return 'failed'
+            liveness['missing'] = previous.get('missing', 0) + 1
+            if liveness['missing'] >= self.missing_limit:
+                logging.info(f"Offer {data_id} no longer shown at {offer['link']}, deactivating")
+                self.flat_offers_manager.mark_removed(data_id, liveness)
+                return 'removed'
+            self.flat_offers_manager.record_check(data_id, liveness)
+            return 'missing'
+
+        parser = self.parser_for(offer)
+        try:
+            data = parser.extract_offer_details(page, parser.get_ad_data(page, data_id))
+        except Exception as e:
+            # Recorded so a page the extraction cannot read does not hold the front of the queue
+            logging.warning(f"Failed to extract offer {data_id} during liveness check: {str(e)}")
+            liveness['error'] = str(e)
+            self.flat_offers_manager.record_check(data_id, liveness)
+            return 'failed'
+        liveness['content_hash'] = content_hash(data)
+        if liveness['content_hash'] == previous.get('content_hash'):
+            self.flat_offers_manager.record_check(data_id, liveness)
+            return 'unchanged'
+
+        updates = {field: data[field] for field in HASHED_FIELDS}
+        updates.update(normalize_offer(updates))
+        changes: List[dict] = []
+        # The first check only stores the hash; stored fields may predate the current extraction
+        if previous.get('content_hash'):
+            changes = [{'field': field, 'old': offer.get(field), 'new': data.get(field), 'changed_at': now}
+                       for field in TRACKED_FIELDS if offer.get(field) != data.get(field)]
+        if changes:
+            updates['changed_at'] = now
+            logging.info(f"Offer {data_id} changed: {', '.join(change['field'] for change in changes)}")
+        self.flat_offers_manager.record_check(data_id, liveness, updates, changes)
+        return 'changed' if changes else 'unchanged'
+
+    def sweep(self) -> Dict[str, int]:
+        """Check the most urgent offers within the request budget, returning the count of each outcome"""
+        now = datetime.now()
+        offers = self.flat_offers_manager.get_offers_to_recheck(
+            self.budget,
+            checked_before=now - timedelta(seconds=self.recheck_after),
+            notified_since=now - timedelta(seconds=self.notified_window),
+            notified_checked_before=now - timedelta(seconds=self.notified_recheck_after)
+        )
+        results: Dict[str, int] = defaultdict(int)
+        start = time.monotonic()
+        for offer in offers:
+            try:
+                outcome = self.check(offer)
+            except Exception as e:
+                logging.warning(f"Liveness check of offer {offer['data_id']} failed: {str(e)}")
+                self.record_failure(offer, None, str(e))
+                outcome = 'failed'
+            results[outcome] += 1
+        self.flat_offers_manager.flush()
+        for parser in self.parsers.values():
+            parser.extract_times.clear()
+        logging.info(f"Liveness sweep checked {len(offers)} offers in {time.monotonic() - start:.0f}s: {dict(results)}")
+        return dict(results)
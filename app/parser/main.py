@@ -1,8 +1,11 @@
-from time import sleep
+import os
 import logging
 from DrissionPage import ChromiumPage, ChromiumOptions
 from database.flat_offers_manager import FlatOffersManager
+from database.crawl_frontier import CrawlFrontier
 from Parser import Parser
+from resource_blocker import ResourceBlocker
+from governor import CrawlGovernor
 import dotenv
 
 # Configure logging
@@ -28,6 +31,33 @@ logger.info("Environment variables loaded")
 flat_offers_manager = FlatOffersManager()
 logger.info("FlatOffersManager initialized")
 
+crawl_frontier = CrawlFrontier()
+
+# Number of browser tabs scraping offers concurrently
+PARSER_WORKERS = int(os.getenv('PARSER_WORKERS', '4'))
+# 'browser' renders every offer page, 'http' fetches them without Chromium
+PARSER_FETCH_MODE = os.getenv('PARSER_FETCH_MODE', 'browser')
+# Incremental crawls stop after this many consecutive already-stored offers
+PARSER_KNOWN_STOP = int(os.getenv('PARSER_KNOWN_STOP', '5'))
+# Set PARSER_BACKFILL=1 to walk every results page instead
+PARSER_BACKFILL = os.getenv('PARSER_BACKFILL', '0') == '1'
+# Block images, fonts, media and ad/tracking hosts in parser tabs
+PARSER_BLOCK_RESOURCES = os.getenv('PARSER_BLOCK_RESOURCES', '1') == '1'
+# Every this many pages one loads unblocked, to measure the bytes blocking saves; 0 never does
+PARSER_BLOCK_BASELINE_EVERY = int(os.getenv('PARSER_BLOCK_BASELINE_EVERY', '50'))
+
+# Requests per second all parser workers may start together, and the burst allowed above it
+PARSER_RATE = float(os.getenv('PARSER_RATE', '1.0'))
+PARSER_BURST = int(os.getenv('PARSER_BURST', '3'))
+# Requests in flight at most, across every worker and daemon crawl
+PARSER_MAX_CONCURRENCY = int(os.getenv('PARSER_MAX_CONCURRENCY', str(PARSER_WORKERS)))
+# Page loads taking longer than this many seconds count as slow and reduce concurrency
+PARSER_SLOW_AFTER = float(os.getenv('PARSER_SLOW_AFTER', '10'))
+
+resource_blocker = ResourceBlocker(baseline_every=PARSER_BLOCK_BASELINE_EVERY) if PARSER_BLOCK_RESOURCES else None
+crawl_governor = CrawlGovernor(rate=PARSER_RATE, burst=PARSER_BURST, max_concurrency=PARSER_MAX_CONCURRENCY,
+                               slow_after=PARSER_SLOW_AFTER)
+
 def get_options():
     logger.debug("Configuring ChromiumOptions")
     options = ChromiumOptions()
@@ -35,6 +65,9 @@ def get_options():
     options.set_argument('--no-sandbox')
     options.set_argument('--headless=new')
     options.set_argument('--disable-backgrounding-occluded-windows')
+    if PARSER_BLOCK_RESOURCES:
+        # Baseline pages still load no images, so the measured saving leaves them out
+        options.no_imgs(True)
     # options.set_argument('--disable-dev-shm-usage')
     logger.debug("ChromiumOptions configured with headless mode and no-sandbox")
     return options
@@ -42,23 +75,18 @@ def get_options():
 def start_parser(type: int, city: int):
     logger.info("Starting parser process")
     try:
-        base_url = 'https://www.wg-gesucht.de'
-        logger.info(f"Initializing ChromiumPage with base URL: {base_url}")
+        logger.info("Initializing ChromiumPage")
 
-        driver = ChromiumPage()
+        driver = ChromiumPage(get_options())
         logger.info("ChromiumPage driver initialized successfully")
 
-        driver.get(base_url)
-        logger.info(f"Navigated to base URL: {base_url}")
-
-        sleep(1)
-        logger.debug("Waited 1 second for page load")
-
-        logger.info("Initializing Parser for WG-Zimmer (type 0)")
+        logger.info(f"Initializing Parser for type {type}, city {city}")
 
         # types: 0 - WG-Zimmer, 1 - 1-Zimmer-Wohnung, 2 - Wohnung, 3 - Haus
         # cities: 0 - München, 1 - Berlin
-        parser = Parser(driver, flat_offers_manager, type, city)
+        parser = Parser(driver, flat_offers_manager, type, city, workers=PARSER_WORKERS, fetch_mode=PARSER_FETCH_MODE,
+                        known_stop=PARSER_KNOWN_STOP, backfill=PARSER_BACKFILL,
+                        frontier=crawl_frontier, resource_blocker=resource_blocker, governor=crawl_governor)
         logger.info("Parser initialized successfully")
 
         try:
@@ -69,6 +97,7 @@ def start_parser(type: int, city: int):
             logger.error(f"Error during parsing advertisements: {str(e)}", exc_info=True)
             raise
 
+        flat_offers_manager.flush()
         logger.info("Closing ChromiumPage driver")
         driver.quit()
         logger.info("Parser process completed successfully")
@@ -89,4 +118,6 @@ if __name__ == "__main__":
     except Exception as e:
         logger.critical("Parser failed to complete", exc_info=True)
         raise
+    finally:
+        flat_offers_manager.close()
 
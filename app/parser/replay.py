@@ -0,0 +1,472 @@
+from typing import Dict, List, Optional, Tuple
+from statistics import mean
+from time import perf_counter
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import tracemalloc
+import logging
+from http_fetcher import HttpFetcher, StaticPage
+from search_urls import build_search_url
+from Parser import Parser, offer_id_from_url
+
+logger = logging.getLogger(__name__)
+
+# Saved pages live in fixtures/search and fixtures/detail; the first line of each
+# file records the URL it was captured from, and a .json file next to it the expected output
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SOURCE_PATTERN = re.compile(r'^<!-- source: (\S+) -->\n')
+
+# Fields a listing card should yield, and the ones a detail page should fill in
+CARD_FIELDS = ['data_id', 'name', 'total_rent', 'area', 'address', 'availability']
+DETAIL_FIELDS = ['name', 'images', 'area', 'total_rent', 'costs.rent', 'costs.additional_costs',
+                 'costs.other_costs', 'costs.deposit', 'costs.transfer_agreement', 'address',
+                 'availability', 'object_details', 'description']
+# Empty defaults of get_flat_offer_fields() that mean the field was not found
+EMPTY_VALUES = (None, '', '0', [], {})
+
+class FixturePage(StaticPage):
+    """Saved page standing in for a browser tab, with the lookups the extraction code uses"""
+
+    @classmethod
+    def load(cls, path: str) -> 'FixturePage':
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        match = SOURCE_PATTERN.match(html)
+        url = match.group(1) if match else f"file://{os.path.abspath(path)}"
+        return cls(url, html[match.end():] if match else html)
+
+    @property
+    def tab_id(self) -> str:
+        return self.url
+
+def fixture_path(fixtures_dir: str, kind: str, name: str) -> str:
+    return os.path.join(fixtures_dir, kind, f"{name}.html")
+
+def list_fixtures(fixtures_dir: str, kind: str) -> List[str]:
+    directory = os.path.join(fixtures_dir, kind)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.html'))
+
+def save_fixture(fixtures_dir: str, kind: str, name: str, url: str, html: str) -> str:
+    path = fixture_path(fixtures_dir, kind, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"<!-- source: {url} -->\n{html}")
+    logger.info(f"Saved {kind} fixture {path}")
+    return path
+
+def get_field(data: dict, field: str):
+    for key in field.split('.'):
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class RoundTripCounter:
+    """Wraps a page or element, counting the calls that each cost a DevTools round trip on a live tab
+
+    Extraction used to run on the tab itself, so counting these calls on a snapshot
+    gives the round trips per offer before the snapshot, without a browser.
+    """
+
+    CALLS = ('ele', 'eles', 'next', 'parent', 'attr')
+    PROPERTIES = ('text', 'html')
+
+    def __init__(self, target, counter: List[int]):
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name: str):
+        value = getattr(self._target, name)
+        if name in self.PROPERTIES:
+            self._counter[0] += 1
+            return value
+        if name in self.CALLS:
+            def call(*args, **kwargs):
+                self._counter[0] += 1
+                return self._wrap(value(*args, **kwargs))
+            return call
+        return value
+
+    def _wrap(self, result):
+        if isinstance(result, list):
+            return [self._wrap(item) for item in result]
+        if result is None or isinstance(result, str):
+            return result
+        return RoundTripCounter(result, self._counter)
+
+def headless_browser(path: Optional[str] = None):
+    """Headless Chromium at path, or DrissionPage's default, for capturing pages and the browser benchmark"""
+    from DrissionPage import ChromiumPage, ChromiumOptions
+    options = ChromiumOptions()
+    if path:
+        options.set_browser_path(path)
+    options.headless()
+    options.set_argument('--no-sandbox')
+    options.set_argument('--headless=new')
+    # chrome-headless-shell opens no tab of its own, and DrissionPage waits for one
+    options.set_argument('about:blank')
+    return ChromiumPage(options)
+
+def offline_parser(offer_type_id: int, city_id: int) -> Parser:
+    """Parser that never opens a browser or the database, for feeding saved pages to its extraction code"""
+    return Parser(None, None, offer_type_id, city_id, workers=1, open_search=False)
+
+class Capturer:
+    """Downloads pages into the fixture corpus, over HTTP or through a headless browser"""
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, use_browser: bool = False, browser_path: Optional[str] = None):
+        self.fixtures_dir = fixtures_dir
+        self.fetcher = HttpFetcher(pool_size=1)
+        self.browser = headless_browser(browser_path) if use_browser else None
+
+    def fetch(self, url: str) -> Tuple[str, str]:
+        if self.browser is not None:
+            self.browser.get(url)
+            self.browser.wait.doc_loaded()
+            return self.browser.url, self.browser.html
+        page = self.fetcher.fetch(url)
+        return page.url, page.html
+
+    def capture_detail(self, url: str) -> str:
+        final_url, html = self.fetch(url)
+        name = offer_id_from_url(final_url) or offer_id_from_url(url) or re.sub(r'\W+', '_', url)[-80:]
+        return save_fixture(self.fixtures_dir, 'detail', name, final_url, html)
+
+    def capture_search(self, url: str, offer_type_id: int, city_id: int, details: int = 0) -> str:
+        """Save a results page, and the first `details` offers linked from it"""
+        final_url, html = self.fetch(url)
+        name = re.sub(r'\W+', '_', final_url.rsplit('/', 1)[-1].replace('.html', ''))
+        path = save_fixture(self.fixtures_dir, 'search', name, final_url, html)
+        if details:
+            parser = offline_parser(offer_type_id, city_id)
+            parser.driver = FixturePage(final_url, html)
+            for card in parser.get_listing_cards()[:details]:
+                try:
+                    self.capture_detail(card['url'])
+                except Exception as e:
+                    logger.warning(f"Failed to capture offer {card['url']}: {str(e)}")
+        return path
+
+    def close(self):
+        self.fetcher.close()
+        if self.browser is not None:
+            self.browser.quit()
+
+class ReplayBenchmark:
+    """Runs saved search and detail pages through the Parser extraction code and measures it
+
+    Each fixture is parsed and extracted `repeat` times; the peak traced memory
+    covers one parse and extraction and counts Python objects only, not lxml's own
+    allocations. Extracted cards and offers are stored next to their fixtures as
+    expected results, and later runs report every card or field that changed. With
+    record_missing off, a fixture without a stored result counts as changed.
+    """
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, offer_type_id: int = 0, city_id: int = 0, repeat: int = 5,
+                 record_missing: bool = True):
+        self.fixtures_dir = fixtures_dir
+        self.repeat = max(1, repeat)
+        self.record_missing = record_missing
+        self.parser = offline_parser(offer_type_id, city_id)
+
+    def run_search(self, update_expected: bool = False) -> Dict[str, object]:
+        cards_per_page = []
+        latencies = []
+        mismatches: Dict[str, List[str]] = {}
+        field_hits = {field: 0 for field in CARD_FIELDS}
+        for path in list_fixtures(self.fixtures_dir, 'search'):
+            page = FixturePage.load(path)
+            for _ in range(self.repeat):
+                self.parser.driver = FixturePage(page.url, page.html)
+                start = perf_counter()
+                cards = self.parser.get_listing_cards()
+                latencies.append(perf_counter() - start)
+            cards_per_page.append(len(cards))
+            for card in cards:
+                for field in CARD_FIELDS:
+                    if card.get(field) not in EMPTY_VALUES:
+                        field_hits[field] += 1
+            # Keyed by URL, so a change is reported per card
+            changed = self.check_expected(path, {card['url']: card for card in cards}, update_expected)
+            if changed:
+                mismatches[path] = changed
+        cards = sum(cards_per_page)
+        return {
+            'pages': len(cards_per_page),
+            'cards': cards,
+            'page_latency_ms': self._latency_summary(latencies),
+            'field_success': {field: hits / cards for field, hits in field_hits.items()} if cards else {},
+            'mismatches': mismatches
+        }
+
+    def run_detail(self, update_expected: bool = False) -> Dict[str, object]:
+        latencies = []
+        peaks = []
+        round_trips = []
+        failures: Dict[str, str] = {}
+        mismatches: Dict[str, List[str]] = {}
+        field_hits = {field: 0 for field in DETAIL_FIELDS}
+        extracted = 0
+        for path in list_fixtures(self.fixtures_dir, 'detail'):
+            fixture = FixturePage.load(path)
+            try:
+                data = None
+                for _ in range(self.repeat):
+                    start = perf_counter()
+                    data = self.extract(fixture)
+                    latencies.append(perf_counter() - start)
+                tracemalloc.start()
+                self.extract(fixture)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                round_trips.append(self.count_round_trips(fixture))
+            except Exception as e:
+                if tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                failures[path] = str(e)
+                continue
+            extracted += 1
+            for field in DETAIL_FIELDS:
+                if get_field(data, field) not in EMPTY_VALUES:
+                    field_hits[field] += 1
+            changed = self.check_expected(path, data, update_expected)
+            if changed:
+                mismatches[path] = changed
+        return {
+            'offers': extracted,
+            'failed': failures,
+            'offer_latency_ms': self._latency_summary(latencies),
+            'peak_memory_kib': {
+                'avg': mean(peaks) / 1024 if peaks else 0,
+                'max': max(peaks) / 1024 if peaks else 0
+            },
+            'field_success': {field: hits / extracted for field, hits in field_hits.items()} if extracted else {},
+            'mismatches': mismatches,
+            # The snapshot itself is the one round trip left per offer
+            'round_trips_before': mean(round_trips) if round_trips else 0,
+            'round_trips_after': 1
+        }
+
+    def count_round_trips(self, fixture: FixturePage) -> int:
+        """DevTools round trips the extraction made per offer when it ran on the tab"""
+        counter = [0]
+        page = RoundTripCounter(FixturePage(fixture.url, fixture.html), counter)
+        self.parser._extract_offer_details(page, self.parser.get_ad_data(page, offer_id_from_url(fixture.url)))
+        return counter[0]
+
+    def extract(self, fixture: FixturePage) -> dict:
+        """Parse the saved HTML and extract an offer, as process_offer does with a tab snapshot"""
+        page = FixturePage(fixture.url, fixture.html)
+        offer_data = self.parser.get_ad_data(page, offer_id_from_url(page.url))
+        return self.parser.extract_offer_details(page, offer_data)
+
+    def check_expected(self, path: str, data: dict, update: bool) -> List[str]:
+        """Compare extracted data with the stored expectation, returning the keys that differ"""
+        expected_path = path[:-len('.html')] + '.json'
+        document = json.loads(json.dumps(data, default=str))
+        if not update and not os.path.exists(expected_path) and not self.record_missing:
+            return ['no expected output']
+        if update or not os.path.exists(expected_path):
+            with open(expected_path, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, ensure_ascii=False, sort_keys=True)
+            return []
+        with open(expected_path, encoding='utf-8') as f:
+            expected = json.load(f)
+        return sorted(key for key in set(expected) | set(document) if expected.get(key) != document.get(key))
+
+    def _latency_summary(self, latencies: List[float]) -> Dict[str, float]:
+        if not latencies:
+            return {}
+        return {
+            'avg': mean(latencies) * 1000,
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'max': max(latencies) * 1000
+        }
+
+    def run_browser(self, browser) -> Dict[str, object]:
+        """Time extraction from a rendered tab: per-field DevTools calls against one html snapshot
+
+        Per-field calls are how offers were extracted before the snapshot, so this gives
+        the before and after of that change on the same pages, and checks that both
+        return the same offer.
+        """
+        cdp_latencies = []
+        snapshot_latencies = []
+        # Per page too: one missing element costs the per-field path a whole lookup timeout
+        pages: Dict[str, Dict[str, float]] = {}
+        differing: Dict[str, List[str]] = {}
+        failures: Dict[str, str] = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for path in list_fixtures(self.fixtures_dir, 'detail'):
+                fixture = FixturePage.load(path)
+                data_id = offer_id_from_url(fixture.url)
+                page_path = os.path.join(directory, os.path.basename(path))
+                with open(page_path, 'w', encoding='utf-8') as f:
+                    f.write(fixture.html)
+                browser.get(f"file://{page_path}")
+                browser.wait.doc_loaded()
+                cdp_data = snapshot_data = None
+                page_cdp = []
+                page_snapshot = []
+                try:
+                    for _ in range(self.repeat):
+                        start = perf_counter()
+                        cdp_data = self.parser._extract_offer_details(browser, self.parser.get_ad_data(browser, data_id))
+                        page_cdp.append(perf_counter() - start)
+                        start = perf_counter()
+                        snapshot_data = self.parser.extract_offer_details(browser,
+                                                                          self.parser.get_ad_data(browser, data_id))
+                        page_snapshot.append(perf_counter() - start)
+                except Exception as e:
+                    failures[path] = str(e).strip()
+                    continue
+                cdp_latencies += page_cdp
+                snapshot_latencies += page_snapshot
+                pages[path] = {'before': mean(page_cdp) * 1000, 'after': mean(page_snapshot) * 1000}
+                changed = sorted(key for key in set(cdp_data) | set(snapshot_data)
+                                 if cdp_data.get(key) != snapshot_data.get(key))
+                if changed:
+                    differing[path] = changed
+        cdp = self._latency_summary(cdp_latencies)
+        snapshot = self._latency_summary(snapshot_latencies)
+        return {
+            'offers': len(cdp_latencies) // self.repeat,
+            'cdp_latency_ms': cdp,
+            'snapshot_latency_ms': snapshot,
+            'speedup': cdp['avg'] / snapshot['avg'] if snapshot else 0,
+            'pages': pages,
+            'failed': failures,
+            'differing': differing
+        }
+
+    def run(self, update_expected: bool = False, browser=None) -> Dict[str, object]:
+        results = {'search': self.run_search(update_expected), 'detail': self.run_detail(update_expected)}
+        if browser is not None:
+            results['browser'] = self.run_browser(browser)
+        return results
+
+def print_report(results: Dict[str, object]):
+    search = results['search']
+    detail = results['detail']
+    print(f"Search pages: {search['pages']}, cards: {search['cards']}")
+    for name, value in search['page_latency_ms'].items():
+        print(f"  page latency {name}: {value:.2f} ms")
+    for field, rate in search['field_success'].items():
+        print(f"  card {field}: {rate:.0%}")
+    for path, cards in search['mismatches'].items():
+        print(f"  CHANGED {path}: {', '.join(cards)}")
+    print(f"Detail pages: {detail['offers']} extracted, {len(detail['failed'])} failed")
+    for name, value in detail['offer_latency_ms'].items():
+        print(f"  offer latency {name}: {value:.2f} ms")
+    print(f"  peak memory avg: {detail['peak_memory_kib']['avg']:.0f} KiB, "
+          f"max: {detail['peak_memory_kib']['max']:.0f} KiB")
+    if detail['offers']:
+        print(f"  DevTools round trips per offer: {detail['round_trips_before']:.0f} with per-field calls (before), "
+              f"{detail['round_trips_after']} with one html snapshot (after)")
+    for field, rate in detail['field_success'].items():
+        print(f"  offer {field}: {rate:.0%}")
+    for path, error in detail['failed'].items():
+        print(f"  FAILED {path}: {error}")
+    for path, fields in detail['mismatches'].items():
+        print(f"  CHANGED {path}: {', '.join(fields)}")
+    browser = results.get('browser')
+    if browser:
+        print(f"Rendered detail pages: {browser['offers']}, per-field DevTools calls (before) "
+              f"against one html snapshot (after)")
+        for name in browser['snapshot_latency_ms']:
+            print(f"  offer latency {name}: {browser['cdp_latency_ms'][name]:.2f} ms before, "
+                  f"{browser['snapshot_latency_ms'][name]:.2f} ms after")
+        print(f"  speedup: {browser['speedup']:.1f}x")
+        for path, page in browser['pages'].items():
+            print(f"  {os.path.basename(path)}: {page['before']:.2f} ms before, {page['after']:.2f} ms after")
+        for path, error in browser['failed'].items():
+            print(f"  FAILED {path}: {error}")
+        for path, fields in browser['differing'].items():
+            print(f"  DIFFERENT OUTPUT {path}: {', '.join(fields)}")
+
+def print_check(results: Dict[str, object]):
+    search = results['search']
+    detail = results['detail']
+    print(f"Checked {search['pages']} search pages ({search['cards']} cards) and "
+          f"{detail['offers'] + len(detail['failed'])} detail pages")
+    for path, error in detail['failed'].items():
+        print(f"  FAILED {path}: {error}")
+    for path, keys in list(search['mismatches'].items()) + list(detail['mismatches'].items()):
+        print(f"  CHANGED {path}: {', '.join(keys)}")
+
+def has_failures(results: Dict[str, object]) -> bool:
+    detail = results['detail']
+    return bool(detail['failed'] or detail['mismatches'] or results['search']['mismatches']
+                or results.get('browser', {}).get('differing') or results.get('browser', {}).get('failed'))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Capture wg-gesucht pages and benchmark the parser on them offline')
+    arg_parser.add_argument('--fixtures', default=FIXTURES_DIR, help='fixture corpus directory')
+    arg_parser.add_argument('--type', type=int, default=0, help='offer type id (0-3)')
+    arg_parser.add_argument('--city', type=int, default=0, help='city id (0 München, 1 Berlin)')
+    arg_parser.add_argument('--browser-path', help='Chromium executable for --browser, instead of DrissionPage\'s default')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    capture = commands.add_parser('capture', help='save live pages as fixtures')
+    capture.add_argument('urls', nargs='*', help='offer URLs; with --search, results page URLs')
+    capture.add_argument('--search', action='store_true', help='capture results pages (the type/city search if no URL)')
+    capture.add_argument('--details', type=int, default=0, help='also capture this many offers per results page')
+    capture.add_argument('--browser', action='store_true', help='render pages in headless Chromium instead of HTTP')
+
+    bench = commands.add_parser('bench', help='run the extraction code over the saved fixtures')
+    bench.add_argument('--repeat', type=int, default=5, help='extractions per fixture')
+    bench.add_argument('--update-expected', action='store_true', help='store the current results as expected')
+    bench.add_argument('--json', help='also write the results to this file')
+    bench.add_argument('--verbose', action='store_true', help='keep the parser\'s per-stage logging')
+    bench.add_argument('--browser', action='store_true',
+                       help='also time extraction from rendered tabs, per-field DevTools calls against the snapshot')
+
+    commands.add_parser('check', help='compare the extraction of every fixture with its expected output, untimed')
+
+    args = arg_parser.parse_args(argv)
+    if args.command == 'capture':
+        capturer = Capturer(args.fixtures, use_browser=args.browser, browser_path=args.browser_path)
+        try:
+            if args.search:
+                for url in args.urls or [build_search_url(args.type, args.city)]:
+                    capturer.capture_search(url, args.type, args.city, details=args.details)
+            for url in [] if args.search else args.urls:
+                capturer.capture_detail(url)
+        finally:
+            capturer.close()
+        return 0
+
+    if not list_fixtures(args.fixtures, 'search') and not list_fixtures(args.fixtures, 'detail'):
+        print(f"No fixtures in {args.fixtures}; save some with the capture command first", file=sys.stderr)
+        return 1
+    # The extraction code logs every stage at INFO, which would dominate the timings
+    if not getattr(args, 'verbose', False):
+        logging.getLogger().setLevel(logging.WARNING)
+    if args.command == 'check':
+        results = ReplayBenchmark(args.fixtures, args.type, args.city, repeat=1, record_missing=False).run()
+        print_check(results)
+        return 1 if has_failures(results) else 0
+    browser = headless_browser(args.browser_path) if args.browser else None
+    try:
+        results = ReplayBenchmark(args.fixtures, args.type, args.city, repeat=args.repeat).run(args.update_expected,
+                                                                                              browser)
+    finally:
+        if browser is not None:
+            browser.quit()
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if has_failures(results) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
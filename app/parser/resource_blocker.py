@@ -0,0 +1,141 @@
+from typing import Dict, List, Optional
+from collections import defaultdict
+from threading import Lock
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# URL patterns per resource type; the parser only reads text and image URLs from data-default
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'media': ['*.mp4*', '*.webm*', '*.mp3*', '*.ogg*']
+}
+
+DEFAULT_BLOCKED_TYPES = ['image', 'font', 'media']
+
+# Ad and tracking hosts; the cookie consent script is left alone because the parser clicks its banner
+DEFAULT_BLOCKED_DOMAINS = [
+    'googletagmanager.com',
+    'google-analytics.com',
+    'googlesyndication.com',
+    'doubleclick.net',
+    'adservice.google.com',
+    'amazon-adsystem.com',
+    'adnxs.com',
+    'criteo.com',
+    'criteo.net',
+    'facebook.net',
+    'hotjar.com',
+    'taboola.com',
+    'outbrain.com'
+]
+
+class ResourceBlocker:
+    """Blocks resource types and domains in browser tabs and counts what each page still loads
+
+    Blocked requests never reach the network, so their size is unknown. To measure
+    the bytes saved, every `baseline_every`-th page loads with the blocklist lifted;
+    its size against that of the blocked pages gives the saving per page. Set
+    baseline_every to 0 to never lift it.
+    """
+
+    def __init__(self, blocked_types: Optional[List[str]] = None, blocked_domains: Optional[List[str]] = None,
+                 baseline_every: int = 50):
+        self.blocked_types = DEFAULT_BLOCKED_TYPES if blocked_types is None else blocked_types
+        self.blocked_domains = DEFAULT_BLOCKED_DOMAINS if blocked_domains is None else blocked_domains
+        self.patterns = [pattern for resource_type in self.blocked_types
+                         for pattern in RESOURCE_TYPE_PATTERNS.get(resource_type, [])]
+        self.patterns += [f"*{domain}*" for domain in self.blocked_domains]
+        self.baseline_every = baseline_every
+        self.lock = Lock()
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.totals: Dict[str, int] = defaultdict(int)
+        # Pages loaded without the blocklist, and the tabs whose current page is one
+        self.baseline: Dict[str, int] = defaultdict(int)
+        self.baseline_tabs = set()
+        self.pages_since_baseline = 0
+
+    def attach(self, tab):
+        """Install the blocklist on a tab and start counting its network events"""
+        tab_id = tab.tab_id
+        try:
+            tab.run_cdp('Network.enable')
+            tab.run_cdp('Network.setBlockedURLs', urls=self.patterns)
+            tab.driver.set_callback('Network.requestWillBeSent', lambda **event: self._count(tab_id, 'requests'))
+            tab.driver.set_callback('Network.loadingFinished',
+                                    lambda **event: self._count(tab_id, 'bytes', int(event.get('encodedDataLength', 0))))
+            tab.driver.set_callback('Network.loadingFailed', lambda **event: self._count_failed(tab_id, event))
+            logging.debug(f"Resource blocking attached to tab {tab_id} with {len(self.patterns)} patterns")
+        except Exception as e:
+            logging.warning(f"Failed to attach resource blocking to tab {tab_id}: {str(e)}")
+
+    def _count(self, tab_id: str, key: str, amount: int = 1):
+        with self.lock:
+            self.counters[tab_id][key] += amount
+
+    def _count_failed(self, tab_id: str, event: dict):
+        if event.get('blockedReason'):
+            self._count(tab_id, 'blocked')
+
+    def _set_blocking(self, tab, blocked: bool):
+        try:
+            tab.run_cdp('Network.setBlockedURLs', urls=self.patterns if blocked else [])
+        except Exception as e:
+            logging.warning(f"Failed to {'restore' if blocked else 'lift'} resource blocking on tab {tab.tab_id}: {str(e)}")
+
+    def page_report(self, tab) -> Dict[str, int]:
+        """Return and reset the counters of the page a tab just loaded; baseline pages have 'baseline' set"""
+        with self.lock:
+            counters = dict(self.counters.pop(tab.tab_id, {}))
+            was_baseline = tab.tab_id in self.baseline_tabs
+            self.baseline_tabs.discard(tab.tab_id)
+            if was_baseline:
+                counters['baseline'] = 1
+                for key, value in counters.items():
+                    self.baseline[key] += value
+                self.baseline['pages'] += 1
+            else:
+                for key, value in counters.items():
+                    self.totals[key] += value
+                self.totals['pages'] += 1
+                self.pages_since_baseline += 1
+            take_baseline = 0 < self.baseline_every <= self.pages_since_baseline
+            if take_baseline:
+                self.pages_since_baseline = 0
+                self.baseline_tabs.add(tab.tab_id)
+        if was_baseline:
+            self._set_blocking(tab, True)
+        if take_baseline:
+            # The tab's next page loads everything, for the saved-bytes estimate
+            self._set_blocking(tab, False)
+        logging.debug(f"Page {tab.url}{' (baseline)' if was_baseline else ''}: {counters.get('requests', 0)} requests, "
+                      f"{counters.get('blocked', 0)} blocked, {counters.get('bytes', 0) / 1024:.0f} KiB loaded")
+        return counters
+
+    def saved_bytes_per_page(self, totals: Dict[str, int]) -> Optional[float]:
+        """Bytes per page the blocklist saved, from the baseline pages; None before the first one"""
+        with self.lock:
+            if not self.baseline['pages'] or not totals.get('pages'):
+                return None
+            return max(0.0, self.baseline['bytes'] / self.baseline['pages'] - totals.get('bytes', 0) / totals['pages'])
+
+    def report(self, totals: Optional[Dict[str, int]] = None, label: str = 'process'):
+        """Log the counters of a run (summed page_report results, baseline pages left out) or of the process"""
+        if totals is None:
+            with self.lock:
+                totals = dict(self.totals)
+        pages = totals.get('pages', 0)
+        if not pages:
+            return
+        loaded = totals.get('requests', 0) - totals.get('blocked', 0)
+        saved = self.saved_bytes_per_page(totals)
+        saving = (f"{saved / 1024:.0f} KiB saved per page ({saved * pages / 1024 / 1024:.1f} MiB in total, "
+                  f"against {self.baseline['pages']} unblocked baseline pages)"
+                  if saved is not None else "bytes saved unknown until a baseline page has loaded")
+        logging.info(f"Resource blocking over {pages} pages of this {label}: "
+                     f"{totals.get('blocked', 0)} requests blocked ({totals.get('blocked', 0) / pages:.1f} per page), "
+                     f"{loaded} requests and {totals.get('bytes', 0) / 1024:.0f} KiB still loaded "
+                     f"({loaded / pages:.1f} requests, {totals.get('bytes', 0) / pages / 1024:.0f} KiB per page), "
+                     f"{saving}")
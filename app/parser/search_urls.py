@@ -0,0 +1,24 @@
+BASE_URL = 'https://www.wg-gesucht.de'
+
+# Parser type code -> (results URL slug, WG-Gesucht category id)
+OFFER_CATEGORIES = {
+    0: ('wg-zimmer', 0),
+    1: ('1-zimmer-wohnungen', 1),
+    2: ('wohnungen', 2),
+    3: ('haeuser', 3)
+}
+
+# Parser city code -> (results URL city name, WG-Gesucht city id)
+CITIES = {
+    0: ('Muenchen', 90),
+    1: ('Berlin', 8)
+}
+
+def build_search_url(offer_type_id: int, city_id: int, page: int = 0) -> str:
+    """Return the canonical results URL for a (type, city) pair, pages counted from 0
+
+    e.g. build_search_url(0, 0) -> https://www.wg-gesucht.de/wg-zimmer-in-Muenchen.90.0.1.0.html
+    """
+    slug, category = OFFER_CATEGORIES[offer_type_id]
+    city_name, city_ref = CITIES[city_id]
+    return f"{BASE_URL}/{slug}-in-{city_name}.{city_ref}.{category}.1.{page}.html"
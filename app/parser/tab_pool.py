@@ -0,0 +1,101 @@
+from typing import Callable, Dict, List, Optional
+from queue import Queue, Empty
+from threading import Lock, Thread
+import time
+import logging
+from DrissionPage import ChromiumPage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class LazyTab:
+    """Handle to a worker's tab that only opens the tab when it is first used"""
+
+    def __init__(self, pool: 'TabPool', slot: int):
+        self.pool = pool
+        self.slot = slot
+
+    def __getattr__(self, name):
+        return getattr(self.pool.get_tab(self.slot), name)
+
+class TabPool:
+    """Bounded pool of reusable browser tabs pulling offer URLs from a work queue"""
+
+    def __init__(self, driver: ChromiumPage, size: int = 4, on_new_tab: Optional[Callable[[object], None]] = None):
+        self.driver = driver
+        self.on_new_tab = on_new_tab
+        self.size = max(1, size)
+        self.tabs: List[Optional[object]] = [None] * self.size
+        self.lock = Lock()
+
+    def get_tab(self, slot: int):
+        """Return the tab owned by a worker slot, opening it on first use"""
+        if self.tabs[slot] is None:
+            logging.debug(f"Opening pool tab {slot}")
+            tab = self.driver.new_tab()
+            if self.on_new_tab is not None:
+                self.on_new_tab(tab)
+            self.tabs[slot] = tab
+        return self.tabs[slot]
+
+    def reset_tab(self, slot: int):
+        """Replace a worker's tab after a failure so the next offer starts clean"""
+        tab = self.tabs[slot]
+        self.tabs[slot] = None
+        if tab is not None:
+            try:
+                tab.close()
+            except Exception as e:
+                logging.warning(f"Failed to close pool tab {slot}: {str(e)}")
+
+    def run(self, urls: List[str], handler: Callable[[object, str], object]) -> Dict[str, object]:
+        """Process all URLs with handler(tab, url) on up to `size` tabs concurrently"""
+        work: Queue = Queue()
+        for url in urls:
+            work.put(url)
+
+        results: Dict[str, object] = {}
+        errors: Dict[str, str] = {}
+        stats = {'processed': 0, 'failed': 0}
+        start = time.monotonic()
+
+        def worker(slot: int):
+            while True:
+                try:
+                    url = work.get_nowait()
+                except Empty:
+                    return
+                try:
+                    result = handler(LazyTab(self, slot), url)
+                    with self.lock:
+                        results[url] = result
+                        stats['processed'] += 1
+                except Exception as e:
+                    logging.error(f"Tab {slot} failed on {url}: {str(e)}")
+                    with self.lock:
+                        results[url] = None
+                        errors[url] = str(e)
+                        stats['failed'] += 1
+                    self.reset_tab(slot)
+
+        threads = [Thread(target=worker, args=(slot,), name=f"tab-{slot}", daemon=True)
+                   for slot in range(min(self.size, len(urls)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.monotonic() - start
+        total = stats['processed'] + stats['failed']
+        stats['elapsed'] = elapsed
+        stats['offers_per_minute'] = total / elapsed * 60 if elapsed > 0 else 0.0
+        stats['results'] = results
+        stats['errors'] = errors
+        logging.info(f"Tab pool processed {total} offers ({stats['failed']} failed) "
+                     f"in {elapsed:.1f}s - {stats['offers_per_minute']:.1f} offers/minute")
+        return stats
+
+    def close(self):
+        """Close every tab owned by the pool"""
+        for slot in range(self.size):
+            self.reset_tab(slot)
@@ -0,0 +1,61 @@
+from typing import Callable, Dict, Optional
+from collections import defaultdict
+from threading import Lock
+from time import sleep, perf_counter
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class Waiter:
+    """Readiness waits with a timeout and retry/backoff policy, timed per stage"""
+
+    def __init__(self, timeout: float = 10, retries: int = 2, backoff: float = 1.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stage_times: Dict[str, float] = defaultdict(float)
+        self.stage_counts: Dict[str, int] = defaultdict(int)
+        self.stage_failures: Dict[str, int] = defaultdict(int)
+        self.lock = Lock()
+
+    def until(self, stage: str, condition: Callable[[float], object], timeout: Optional[float] = None,
+              on_retry: Optional[Callable[[], None]] = None) -> bool:
+        """Wait until condition(timeout) is truthy, calling on_retry between attempts
+
+        condition receives the per-attempt timeout and is expected to block for at
+        most that long, e.g. `lambda t: tab.wait.eles_loaded(locator, timeout=t)`.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = perf_counter()
+        ready = False
+        for attempt in range(self.retries + 1):
+            try:
+                ready = bool(condition(timeout))
+            except Exception as e:
+                logging.debug(f"Wait for '{stage}' raised: {str(e)}")
+                ready = False
+            if ready or attempt == self.retries:
+                break
+            delay = self.backoff * 2 ** attempt
+            logging.warning(f"'{stage}' not ready after {timeout}s, retrying in {delay:.1f}s")
+            sleep(delay)
+            if on_retry is not None:
+                on_retry()
+
+        elapsed = perf_counter() - start
+        with self.lock:
+            self.stage_times[stage] += elapsed
+            self.stage_counts[stage] += 1
+            if not ready:
+                self.stage_failures[stage] += 1
+        if not ready:
+            logging.warning(f"Gave up waiting for '{stage}' after {elapsed:.1f}s")
+        return ready
+
+    def report(self):
+        with self.lock:
+            for stage in sorted(self.stage_times, key=self.stage_times.get, reverse=True):
+                count = self.stage_counts[stage]
+                logging.info(f"Wait stage '{stage}': {self.stage_times[stage]:.1f}s total over {count} waits "
+                             f"(avg {self.stage_times[stage] / count:.2f}s, {self.stage_failures[stage]} timed out)")
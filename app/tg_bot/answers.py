@@ -1,9 +1,7 @@
 import logging
 import os
 import json
-from database.user_manager import UserManager
-from database.finder_manager import FinderManager
-from database.flat_offers_manager import FlatOffersManager
+from database.managers import user_manager, flat_offers_manager, finder_manager
 from translatorapi import TranslatorAPI
 from mapsapi import MapsAPI
 
@@ -24,11 +22,6 @@ logger = logging.getLogger()
 logger.addHandler(file_handler)
 logger.addHandler(info_handler)
 
-# Managers
-user_manager = UserManager()
-flat_offers_manager = FlatOffersManager()
-finder_manager = FinderManager(flat_offers_manager)
-
 # Load language files
 LANGUAGE_FILES = {}
 language_dir = './languages'
@@ -106,8 +99,10 @@ async def get_my_offers(user_data):
         return text_lang['errors']['no_offers_found']
 
     response = []
+    # Card view of all offers in one query instead of one whole document per offer
+    offers = {offer['data_id']: offer for offer in await flat_offers_manager.get_offers(offers_ids)}
     for offer_id in offers_ids:
-        offer = await flat_offers_manager.get_offer(offer_id)
+        offer = offers.get(offer_id)
         if offer is None:
             logging.warning(f"Offer not found: chat_id={chat_id}, offer_id={offer_id}")
             continue
@@ -306,8 +301,7 @@ async def offer_details(user_data, offer_id):
     if offer is None:
         logging.warning(f"Offer not found: chat_id={chat_id}, offer_id={offer_id}")
         return text_lang['errors']['offer_not_found']
-    finders = await finder_manager.get_finders_by_user(chat_id)
-    finders_with_offer = [f for f in finders if offer_id in f['offers']]
+    finders_with_offer = await finder_manager.get_finders_with_offer(chat_id, offer_id)
     logging.info(f"Found {len(finders_with_offer)} finders with offer {offer_id}")
     finder_text: str = ""
     for finder in finders_with_offer:
@@ -358,8 +352,7 @@ async def original_offer_details(user_data, offer_id):
     text_lang = eval(f"{user_data['language']}_texts")
     translator = eval(f"{user_data['language']}_translator")
     offer = await flat_offers_manager.get_offer(offer_id)
-    finders = await finder_manager.get_finders_by_user(chat_id)
-    finders_with_offer = [f for f in finders if offer_id in f['offers']]
+    finders_with_offer = await finder_manager.get_finders_with_offer(chat_id, offer_id)
     logging.info(f"Found {len(finders_with_offer)} finders with offer {offer_id}")
     finder_text: str = ""
     for finder in finders_with_offer:
@@ -0,0 +1,168 @@
+from typing import Callable, Dict, List, Type
+from datetime import datetime
+from time import perf_counter
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+import bson
+import dotenv
+from database.models import Model, Offer, Finder, User
+from database.views import CARD_VIEW, DETAIL_VIEW
+
+dotenv.load_dotenv()
+
+def sample_offer(index: int) -> dict:
+    """Offer shaped like the parser's detail-page output"""
+    return {
+        '_id': bson.ObjectId(),
+        'data_id': str(10000000 + index),
+        'link': f'https://www.wg-gesucht.de/wohnungen-in-Berlin.{10000000 + index}.html',
+        'is_active': True,
+        'name': f'Helle 2-Zimmer-Wohnung mit Balkon Nr. {index}',
+        'type': 2,
+        'offer_type': 2,
+        'offer_type_id': 2,
+        'city': 'Berlin',
+        'city_id': 8,
+        'address': f'Musterstraße {index % 200} | 10{index % 1000:03d} Berlin Mitte',
+        'area': f'{40 + index % 60}m²',
+        'total_rent': f'{700 + index % 900}€',
+        'images': [f'https://img.wg-gesucht.de/media/up/2024/{index}/{n}.jpg' for n in range(8)],
+        'costs': {'rent': '650€', 'additional_costs': '120€', 'other_costs': '0', 'deposit': '1.950€',
+                  'transfer_agreement': '0', 'credit_check': '0'},
+        'availability': {'frei ab: ': '01.11.2024', 'listed_at': datetime(2024, 10, 1)},
+        'object_details': ['Altbau', 'Balkon', 'Badewanne', 'Dielen', 'Zentralheizung'],
+        'description': ['Die Wohnung liegt im dritten Stock eines ruhigen Altbaus. ' * 8 for n in range(4)],
+        'total_rent_value': float(700 + index % 900),
+        'area_value': float(40 + index % 60),
+        'costs_values': {'rent': 650.0, 'additional_costs': 120.0, 'deposit': 1950.0},
+        'available_from': datetime(2024, 11, 1),
+        'available_to': None,
+        'created_at': datetime(2024, 10, 1),
+        'details_parsed': True
+    }
+
+def sample_finder(index: int) -> dict:
+    return {
+        '_id': bson.ObjectId(),
+        'finder_id': 100000 + index,
+        'user_id': 5000000 + index,
+        'is_active': True,
+        'created_at': 1727740800.0 + index,
+        'type': 'transit',
+        'offer_type': 'housing',
+        'offer_type_id': 2,
+        'city_id': 8,
+        'duration': 1800
+    }
+
+def sample_user(index: int) -> dict:
+    return {
+        '_id': bson.ObjectId(),
+        'chat_id': 5000000 + index,
+        'is_active': True,
+        'name': f'user{index}',
+        'notifications': True,
+        'preferences': {'address': 'Alexanderplatz 1, Berlin', 'address_id': '', 'distance': 0, 'notifications': True},
+        'premium_subscription': False,
+        'language': 'de',
+        'state': 'main',
+        'city_id': 8,
+        'type': -1,
+        'finder_id': None
+    }
+
+def project(document: dict, view: dict) -> dict:
+    """Apply a views.py projection to a sample document"""
+    if any(value == 1 for value in view.values()):
+        return {key: value for key, value in document.items() if view.get(key) == 1}
+    return {key: value for key, value in document.items() if view.get(key, 1) != 0}
+
+def retained_bytes(build: Callable[[], list]) -> int:
+    """Memory still allocated by what build() returns, once its temporaries are gone"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+def benchmark(name: str, model: Type[Model], documents: List[dict], repeat: int) -> Dict[str, float]:
+    """Memory per entity and decode/encode time per entity of plain dicts against models"""
+    count = len(documents)
+    encoded = [bson.encode(document) for document in documents]
+    models = model.from_documents(documents)
+    results = {
+        'dict_bytes': retained_bytes(lambda: [bson.decode(data) for data in encoded]) / count,
+        'model_bytes': retained_bytes(lambda: [model.from_document(bson.decode(data)) for data in encoded]) / count,
+        'dict_decode_us': best_time(lambda: [bson.decode(data) for data in encoded], repeat) / count * 1e6,
+        'model_decode_us': best_time(lambda: [model.from_document(bson.decode(data)) for data in encoded],
+                                     repeat) / count * 1e6,
+        'dict_encode_us': best_time(lambda: [bson.encode(document) for document in documents], repeat) / count * 1e6,
+        'model_encode_us': best_time(lambda: [bson.encode(item.to_document()) for item in models],
+                                     repeat) / count * 1e6
+    }
+    results['memory_saved'] = 1 - results['model_bytes'] / results['dict_bytes']
+    print(f"{name:<14} {results['dict_bytes']:>9.0f} B {results['model_bytes']:>9.0f} B {results['memory_saved']:>6.0%}"
+          f" {results['dict_decode_us']:>9.1f} us {results['model_decode_us']:>9.1f} us"
+          f" {results['dict_encode_us']:>9.1f} us {results['model_encode_us']:>9.1f} us")
+    return results
+
+def load_documents(count: int) -> Dict[str, List[dict]]:
+    """Up to count documents of each collection from the configured database"""
+    from database.database import get_database
+    db = get_database()
+    offers = list(db['flat_offers'].find({}, DETAIL_VIEW).limit(count))
+    return {
+        'offer detail': offers,
+        'offer card': list(db['flat_offers'].find({}, CARD_VIEW).limit(count)),
+        'finder': list(db['finders'].find().limit(count)),
+        'user': list(db['users'].find().limit(count))
+    }
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compare memory and decode time of slotted models and plain dicts')
+    arg_parser.add_argument('--count', type=int, default=5000, help='documents per kind')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='timing runs, the fastest is reported')
+    arg_parser.add_argument('--from-db', action='store_true', help='use stored documents instead of generated ones')
+    arg_parser.add_argument('--json', help='also write the results to this file')
+    args = arg_parser.parse_args()
+
+    random.seed(0)
+    if args.from_db:
+        documents = load_documents(args.count)
+    else:
+        offers = [sample_offer(index) for index in range(args.count)]
+        documents = {
+            'offer detail': [project(offer, DETAIL_VIEW) for offer in offers],
+            'offer card': [project(offer, CARD_VIEW) for offer in offers],
+            'finder': [sample_finder(index) for index in range(args.count)],
+            'user': [sample_user(index) for index in range(args.count)]
+        }
+    models = {'offer detail': Offer, 'offer card': Offer, 'finder': Finder, 'user': User}
+
+    print(f"{'entity':<14} {'dict mem':>11} {'model mem':>11} {'saved':>6} {'dict dec':>12} {'model dec':>12}"
+          f" {'dict enc':>12} {'model enc':>12}")
+    results = {}
+    for name, items in documents.items():
+        if items:
+            results[name] = benchmark(name, models[name], items, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 async def clean_database():
     """Delete all offers that do not have offer_type_id field"""
     flat_offers_manager = FlatOffersManager()
-    offers = await flat_offers_manager.get_all_offers()
+    offers = await flat_offers_manager.get_all_offers({'data_id': 1, 'offer_type_id': 1, 'offer_type': 1, 'city_id': 1, 'city': 1})
 
     deleted_count = 0
     for offer in offers:
@@ -1,11 +1,70 @@
 import os
 import logging
-from pymongo import MongoClient
-from typing import Dict, Any
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import OperationFailure
+from typing import Dict, Any, Optional
+from threading import Lock
+from pymongo.database import Database
 import dotenv
 
 dotenv.load_dotenv()
 
+# Connection pool of the one MongoClient a process shares
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '20'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+# Timeouts in milliseconds
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '20000'))
+
+_database: Optional[Database] = None
+_database_lock = Lock()
+
+# Indexes per collection, matching the query shapes of the bot and the parser; both apps create the same set
+INDEXES = {
+    'flat_offers': [
+        ([('data_id', ASCENDING)], {'name': 'data_id_unique', 'unique': True}),
+        # Covers the match view of views.py: every projected and filtered field is part of the key
+        ([('is_active', ASCENDING), ('city_id', ASCENDING), ('offer_type_id', ASCENDING), ('details_parsed', ASCENDING),
+          ('data_id', ASCENDING), ('address', ASCENDING)], {'name': 'active_city_type_parsed_match'}),
+        ([('is_active', ASCENDING), ('total_rent_value', ASCENDING)], {'name': 'active_rent'}),
+        ([('is_active', ASCENDING), ('availability.listed_at', DESCENDING)], {'name': 'active_listed_at'}),
+        ([('is_active', ASCENDING), ('liveness.checked_at', ASCENDING)], {'name': 'active_checked_at'}),
+        ([('is_active', ASCENDING), ('notified_at', DESCENDING)], {'name': 'active_notified_at'}),
+        ([('enriched_at', ASCENDING)], {'name': 'enriched_at'}),
+        ([('created_at', ASCENDING)], {'name': 'created_at'})
+    ],
+    'users': [
+        ([('chat_id', ASCENDING)], {'name': 'chat_id_unique', 'unique': True}),
+        ([('is_active', ASCENDING)], {'name': 'is_active'})
+    ],
+    'finders': [
+        ([('finder_id', ASCENDING)], {'name': 'finder_id_unique', 'unique': True}),
+        ([('user_id', ASCENDING)], {'name': 'user_id'}),
+        ([('is_active', ASCENDING), ('duration', ASCENDING)], {'name': 'active_duration'}),
+        ([('created_at', ASCENDING)], {'name': 'created_at'})
+    ],
+    'finder_evaluations': [
+        ([('finder_id', ASCENDING), ('offer_id', ASCENDING)], {'name': 'finder_offer_unique', 'unique': True}),
+        ([('finder_id', ASCENDING), ('matched', ASCENDING), ('evaluated_at', ASCENDING)], {'name': 'finder_matched'}),
+        # Only evaluations made on a listing card alone, looked up with their outcome once the offer is enriched
+        ([('finder_id', ASCENDING), ('offer_id', ASCENDING), ('matched', ASCENDING)],
+         {'name': 'finder_provisional', 'partialFilterExpression': {'provisional': True}})
+    ],
+    'crawl_frontier': [
+        ([('url', ASCENDING)], {'name': 'url_unique', 'unique': True}),
+        ([('target', ASCENDING), ('status', ASCENDING), ('next_attempt_at', ASCENDING)], {'name': 'target_status_due'})
+    ],
+    'crawl_cursors': [
+        ([('target', ASCENDING)], {'name': 'target_unique', 'unique': True})
+    ]
+}
+
+# Indexes of earlier versions that a current one makes redundant, dropped by ensure_indexes
+DROPPED_INDEXES = {
+    'flat_offers': ['active_city_type', 'active_city_type_match']
+}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -13,7 +72,16 @@ def create_database():
     """Create and initialize the database"""
     MONGODB_URI = os.getenv('MONGODB_URI')
     MONGO_DB_NAME = os.getenv('MONGO_DB_NAME')
-    client = MongoClient(MONGODB_URI)
+    # connect=False defers the connection to the first operation
+    client = MongoClient(
+        MONGODB_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        connect=False
+    )
     db = client[MONGO_DB_NAME]
 
     # Create collections if they don't exist
@@ -30,9 +98,56 @@ def create_database():
         db.create_collection('finders')
         logging.info("Created 'finders' collection.")
 
+    ensure_indexes(db)
+    report_indexes(db)
+
     logging.info("Database initialized successfully")
     return db
 
+def get_database() -> Database:
+    """Return the process-wide database, creating the client and collections on first use"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = create_database()
+    return _database
+
+def ensure_indexes(db):
+    """Create every index in INDEXES and drop the ones in DROPPED_INDEXES; existing ones are left as they are"""
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. duplicate values blocking a unique index; the rest are still created
+                logging.error(f"Failed to create index {options['name']} on {collection}: {str(e)}")
+    for collection, names in DROPPED_INDEXES.items():
+        for name in names:
+            try:
+                if name in db[collection].index_information():
+                    db[collection].drop_index(name)
+                    logging.info(f"Dropped index {name} on {collection}")
+            except OperationFailure as e:
+                logging.error(f"Failed to drop index {name} on {collection}: {str(e)}")
+
+def report_indexes(db):
+    """Log expected indexes that are missing and existing ones with no use since the server started"""
+    for collection, indexes in INDEXES.items():
+        expected = {options['name'] for keys, options in indexes}
+        try:
+            stats = list(db[collection].aggregate([{'$indexStats': {}}]))
+        except OperationFailure as e:
+            logging.warning(f"Cannot read index usage of {collection}: {str(e)}")
+            continue
+        existing = {index['name']: index['accesses']['ops'] for index in stats}
+        missing = expected - set(existing)
+        if missing:
+            logging.warning(f"Missing indexes on {collection}: {', '.join(sorted(missing))}")
+        unused = [name for name, ops in existing.items() if ops == 0 and name != '_id_']
+        if unused:
+            logging.info(f"Unused indexes on {collection} since server start: {', '.join(sorted(unused))}")
+
 def validate_user_data(user_data: Dict[str, Any]) -> bool:
     """Validate user data"""
     required_fields = ['chat_id', 'is_active', 'notifications', 'premium_subscription', 'language']
@@ -106,9 +221,7 @@ def get_finder_fields() -> Dict[str, Any]:
         'offer_type': '',
         'offer_type_id': -1,
         'duration': -1,
-        'user_id': 0,
-        'offers': [],
-        'parsed_offers': []
+        'user_id': 0
     }
 
 
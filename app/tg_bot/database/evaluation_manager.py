@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, List, Optional, Set
+from datetime import datetime
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+from database.database import get_database
+from database.executor import run_query
+import logging
+
+# Server error code of a duplicate key in a unique index
+DUPLICATE_KEY = 11000
+
+class EvaluationManager:
+    """Which offers each finder has evaluated, one finder_evaluations document per (finder_id, offer_id)
+
+    A document records the travel duration in seconds and whether the offer matched.
+    The unique finder_offer_unique index keeps one per pair and answers membership
+    lookups without reading the documents. Evaluations of an offer stored from its
+    listing card alone are provisional and replaced once the offer is enriched.
+    """
+
+    def __init__(self):
+        logging.info("EvaluationManager initialized")
+
+    @property
+    def db(self):
+        return get_database()
+
+    @property
+    def evaluations_collection(self):
+        return self.db['finder_evaluations']
+
+    @staticmethod
+    def evaluation(finder_id: int, offer_id: str, duration: Optional[int], matched: bool,
+                   provisional: bool = False) -> Dict:
+        evaluation = {
+            'finder_id': finder_id,
+            'offer_id': offer_id,
+            'duration': duration,
+            'matched': matched,
+            'evaluated_at': datetime.now()
+        }
+        # Left out when final, so only provisional evaluations enter the finder_provisional index
+        if provisional:
+            evaluation['provisional'] = True
+        return evaluation
+
+    async def get_evaluated_ids(self, finder_id: int, offer_ids: Iterable[str]) -> Set[str]:
+        """Which of the offers the finder has evaluated, matched or not
+
+        Only the given candidates are looked up, answered from the finder_offer_unique
+        index alone, so the cost follows the active offers rather than the finder's history.
+        """
+        offer_ids = list(offer_ids)
+        if not offer_ids:
+            return set()
+        return await run_query('finder_evaluations.find', lambda: {
+            evaluation['offer_id'] for evaluation in self.evaluations_collection.find(
+                {'finder_id': finder_id, 'offer_id': {'$in': offer_ids}}, {'_id': 0, 'offer_id': 1}
+            )
+        })
+
+    async def get_provisional_matches(self, finder_id: int, offer_ids: Iterable[str]) -> Dict[str, bool]:
+        """Which of the offers the finder evaluated on their listing card alone, with whether they matched"""
+        offer_ids = list(offer_ids)
+        if not offer_ids:
+            return {}
+        return await run_query('finder_evaluations.find', lambda: {
+            evaluation['offer_id']: evaluation['matched'] for evaluation in self.evaluations_collection.find(
+                {'finder_id': finder_id, 'offer_id': {'$in': offer_ids}, 'provisional': True},
+                {'_id': 0, 'offer_id': 1, 'matched': 1}
+            )
+        })
+
+    async def get_matched_ids(self, finder_ids: Iterable[int]) -> List[str]:
+        """IDs of the offers that matched any of the finders, oldest match first, without duplicates"""
+        evaluations = await run_query('finder_evaluations.find', lambda: list(self.evaluations_collection.find(
+            {'finder_id': {'$in': list(finder_ids)}, 'matched': True},
+            {'_id': 0, 'offer_id': 1},
+            sort=[('evaluated_at', 1)]
+        )))
+        return list(dict.fromkeys(evaluation['offer_id'] for evaluation in evaluations))
+
+    async def get_matching_finder_ids(self, finder_ids: Iterable[int], offer_id: str) -> Set[int]:
+        """Which of the finders matched the offer"""
+        return await run_query('finder_evaluations.find', lambda: {
+            evaluation['finder_id'] for evaluation in self.evaluations_collection.find(
+                {'finder_id': {'$in': list(finder_ids)}, 'offer_id': offer_id, 'matched': True},
+                {'_id': 0, 'finder_id': 1}
+            )
+        })
+
+    async def add_evaluations(self, evaluations: List[Dict]) -> int:
+        """Insert evaluations in one unordered bulk write, returning how many were new"""
+        if not evaluations:
+            return 0
+        try:
+            result = await run_query('finder_evaluations.insert_many', self.evaluations_collection.insert_many,
+                                     evaluations, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Pairs evaluated concurrently are already stored; anything else is a real failure
+            errors = e.details.get('writeErrors', [])
+            others = [error for error in errors if error.get('code') != DUPLICATE_KEY]
+            if others:
+                logging.error(f"Failed to store {len(others)} of {len(evaluations)} finder evaluations: {others[0].get('errmsg')}")
+            return e.details.get('nInserted', 0)
+
+    async def replace_evaluations(self, evaluations: List[Dict]):
+        """Overwrite the evaluations of the same pairs, as when a provisional one is redone"""
+        if not evaluations:
+            return
+        await run_query('finder_evaluations.bulk_write', self.evaluations_collection.bulk_write, [
+            ReplaceOne({'finder_id': evaluation['finder_id'], 'offer_id': evaluation['offer_id']}, evaluation,
+                       upsert=True)
+            for evaluation in evaluations
+        ], ordered=False)
+
+    async def set_matched(self, finder_id: int, offer_id: str, matched: bool):
+        """Record or overwrite the outcome of one pair, keeping a stored duration"""
+        await run_query(
+            'finder_evaluations.update_one',
+            self.evaluations_collection.update_one,
+            {'finder_id': finder_id, 'offer_id': offer_id},
+            {'$set': {'matched': matched, 'evaluated_at': datetime.now()}, '$setOnInsert': {'duration': None}},
+            upsert=True
+        )
+
+    async def delete_by_finder(self, finder_id: int):
+        await run_query('finder_evaluations.delete_many', self.evaluations_collection.delete_many, {'finder_id': finder_id})
@@ -0,0 +1,52 @@
+from typing import Any, Callable, Deque, Dict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import os
+import time
+import logging
+
+# Threads running pymongo calls for the bot's event loop; at most MONGO_MAX_POOL_SIZE are useful
+MONGO_EXECUTOR_WORKERS = int(os.getenv('MONGO_EXECUTOR_WORKERS', '8'))
+# Latency samples kept per operation name
+LATENCY_SAMPLES = 1000
+
+_executor = ThreadPoolExecutor(max_workers=MONGO_EXECUTOR_WORKERS, thread_name_prefix='mongo')
+_latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+async def run_query(name: str, function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking pymongo call on the executor so the event loop keeps serving other chats
+
+    Cursors must be consumed inside the call, e.g. with lambda: list(collection.find(query)).
+    Arguments such as self.offers_collection.find_one are evaluated on the event loop;
+    that costs no I/O because main() creates the database before polling starts.
+    The time from submission to result is recorded under `name`.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_executor, partial(function, *args, **kwargs))
+    finally:
+        _latencies[name].append(time.perf_counter() - start)
+
+def latency_stats() -> Dict[str, Dict[str, float]]:
+    """Count and p50/p95/p99/max latency in ms of each operation over its recent samples"""
+    stats = {}
+    for name, samples in list(_latencies.items()):
+        values = sorted(samples)
+        if not values:
+            continue
+        stats[name] = {
+            'count': len(values),
+            'p50': values[int(len(values) * 0.5)] * 1000,
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+            'p99': values[min(len(values) - 1, int(len(values) * 0.99))] * 1000,
+            'max': values[-1] * 1000
+        }
+    return stats
+
+def log_latency_stats():
+    for name, stats in sorted(latency_stats().items()):
+        logging.info(f"Mongo {name}: {stats['count']} calls, p50 {stats['p50']:.1f} ms, "
+                     f"p95 {stats['p95']:.1f} ms, p99 {stats['p99']:.1f} ms, max {stats['max']:.1f} ms")
@@ -1,11 +1,24 @@
-from typing import Dict, Optional, List
+from typing import Optional, List, Dict
+import os
 import time
 import random
-from database.database import create_database, validate_finder_data
+from database.database import get_database, validate_finder_data
 from mapsapi import maps_api
 from database.flat_offers_manager import FlatOffersManager
+from database.evaluation_manager import EvaluationManager
+from database.executor import run_query
+from database.cache import LRUCache, NOT_FOUND
+from database.models import Finder, to_document
 import logging
 
+# Evaluations stored per bulk insert while a finder is matched, so a crash loses at most this many
+EVALUATION_BATCH_SIZE = 50
+# Set to 1 until migrate_finder_evaluations.py has run, so finders still carrying their
+# offer lists skip the offers listed there; afterwards the lists are neither read nor loaded
+LEGACY_FINDER_LISTS = os.getenv('LEGACY_FINDER_LISTS', '0') == '1'
+# Finder reads leave out the lists of unmigrated finders unless they are still in use
+FINDER_VIEW = None if LEGACY_FINDER_LISTS else {'offers': 0, 'parsed_offers': 0}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -19,44 +32,41 @@ warning_handler.setLevel(logging.WARNING)
 warning_handler.setFormatter(formatter)
 logging.getLogger().addHandler(warning_handler)
 
-db = create_database()
-
-if db is None:
-    print("Database not initialized")
-    exit(1)
-
 class FinderManager:
-    def __init__(self, flat_offers_manager: FlatOffersManager):
-        self.db = db
-        self.finders_collection = self.db['finders']
-        self.cached_findings: Dict[int, dict] = {}
-        self.last_access: Dict[int, float] = {}
-        self.cache_duration = 600  # 10 minutes in seconds
+    def __init__(self, flat_offers_manager: FlatOffersManager, evaluation_manager: EvaluationManager):
+        self.cache = LRUCache('finders')
         self.life_duration = 30*24*60*60  # 30 days in seconds
         self.flat_offers_manager = flat_offers_manager
+        self.evaluation_manager = evaluation_manager
         logging.info("FinderManager initialized")
 
-    async def get_finder(self, finder_id: int) -> Optional[dict]:
-        current_time = time.time()
+    @property
+    def db(self):
+        return get_database()
+
+    @property
+    def finders_collection(self):
+        return self.db['finders']
 
+    async def get_finder(self, finder_id: int) -> Optional[Finder]:
         # Check if finder is in cache and still fresh
-        if finder_id in self.cached_findings:
-            if current_time - self.last_access[finder_id] < self.cache_duration:
-                self.last_access[finder_id] = current_time
-                return self.cached_findings[finder_id]
-            else:
-                # Remove expired cache
-                del self.cached_findings[finder_id]
-                del self.last_access[finder_id]
+        finder = self.cache.get(finder_id)
+        if finder is NOT_FOUND:
+            return None
+        if finder is not None:
+            return finder
 
         # Get from database
-        finder = self.finders_collection.find_one({'finder_id': finder_id})
+        token = self.cache.token()
+        finder = await run_query('finders.find_one', lambda: Finder.from_document(
+            self.finders_collection.find_one({'finder_id': finder_id}, FINDER_VIEW)
+        ))
         if finder:
             logging.info(f"Finder found: {finder}")
-            self.cached_findings[finder_id] = finder
-            self.last_access[finder_id] = current_time
+            self.cache.set(finder_id, finder, token=token)
             return finder
         else:
+            self.cache.set_missing(finder_id, token)
             logging.warning(f"Finder with ID {finder_id} not found")
         return None
 
@@ -71,13 +81,16 @@ class FinderManager:
         finder_data['user_id'] = user_id  # Associate finder with user
         finder_data['created_at'] = current_time
         # Update cache
-        self.cached_findings[finder_id] = finder_data
-        self.last_access[finder_id] = current_time
+        if not isinstance(finder_data, Finder):
+            finder_data = Finder.from_document(finder_data)
+        self.cache.set(finder_id, finder_data)
 
         # Update database
-        self.finders_collection.update_one(
+        await run_query(
+            'finders.update_one',
+            self.finders_collection.update_one,
             {'finder_id': finder_id},
-            {'$set': finder_data},
+            {'$set': finder_data.to_document()},
             upsert=True
         )
         logging.info(f"Saving finder with ID: {finder_id} for user ID: {user_id}")
@@ -86,30 +99,31 @@ class FinderManager:
         finder_data = await self.get_finder(finder_id)
         if finder_data:
             finder_data['is_active'] = False
-            self.finders_collection.update_one(
+            await run_query(
+                'finders.update_one',
+                self.finders_collection.update_one,
                 {'finder_id': finder_id},
                 {'$set': {'is_active': False}}
             )
             # Remove from cache
-            if finder_id in self.cached_findings:
-                del self.cached_findings[finder_id]
-                del self.last_access[finder_id]
+            self.cache.delete(finder_id)
             logging.info(f"Deactivating finder with ID: {finder_id}")
 
     async def delete_finder(self, finder_id: int):
         # Remove from cache
-        if finder_id in self.cached_findings:
-            del self.cached_findings[finder_id]
-            del self.last_access[finder_id]
+        self.cache.delete(finder_id)
 
         # Remove from database
-        self.finders_collection.delete_one({'finder_id': finder_id})
+        await run_query('finders.delete_one', self.finders_collection.delete_one, {'finder_id': finder_id})
+        await self.evaluation_manager.delete_by_finder(finder_id)
         logging.info(f"Deleting finder with ID: {finder_id}")
 
     async def update_finder(self, finder_id: int, finder_data: dict):
-        self.finders_collection.update_one(
+        await run_query(
+            'finders.update_one',
+            self.finders_collection.update_one,
             {'finder_id': finder_id},
-            {'$set': finder_data}
+            {'$set': to_document(finder_data)}
         )
         logging.info(f"Updating finder with ID: {finder_id}")
 
@@ -117,67 +131,75 @@ class FinderManager:
         return random.randint(100000, 999999)
 
     async def clean_expired_cache(self):
-        current_time = time.time()
-        expired_finders = [finder_id for finder_id, last_access in self.last_access.items()
-                         if current_time - last_access >= self.life_duration]
-
-        for finder_id in expired_finders:
-            del self.cached_findings[finder_id]
-            del self.last_access[finder_id]
+        self.cache.purge_expired()
         logging.info("Cleaning expired cache")
+        self.cache.report()
 
     async def delete_expired_finders(self):
-        current_time = time.time()
-        expired_finders = [finder_id for finder_id, last_access in self.last_access.items()
-                         if current_time - last_access >= self.life_duration]
-        for finder_id in expired_finders:
-            await self.delete_finder(finder_id)
-        logging.info("Deleting expired finders")
+        # Finders older than life_duration by their creation time, not by when they were last cached
+        cutoff = time.time() - self.life_duration
+        expired_finders = await run_query(
+            'finders.find',
+            lambda: list(self.finders_collection.find({'created_at': {'$lt': cutoff}}, {'finder_id': 1}))
+        )
+        for finder in expired_finders:
+            await self.delete_finder(finder['finder_id'])
+        logging.info(f"Deleting {len(expired_finders)} expired finders")
 
-    async def get_finders_by_user(self, user_id: int) -> List[dict]:
+    async def has_finders_created_since(self, since: float) -> bool:
+        """Whether a finder was created since a time.time() timestamp"""
+        return await run_query('finders.find_one', lambda: self.finders_collection.find_one(
+            {'created_at': {'$gte': since}}, {'_id': 1}
+        ) is not None)
+
+    async def get_finders_by_user(self, user_id: int) -> List[Finder]:
         logging.info(f"Fetching finders for user ID: {user_id}")
-        return list(self.finders_collection.find({'user_id': user_id}))
+        return await run_query('finders.find', lambda: Finder.from_documents(
+            self.finders_collection.find({'user_id': user_id}, FINDER_VIEW)
+        ))
 
-    async def get_offers_by_finder(self, finder_id: int) -> List[dict]:
-        finder = await self.get_finder(finder_id)
-        if finder:
-            return finder['offers']
+    async def get_offers_by_finder(self, finder_id: int) -> List[str]:
         logging.info(f"Fetching offers for finder ID: {finder_id}")
-        return []
+        return await self.evaluation_manager.get_matched_ids([finder_id])
 
-    async def get_findings_by_user(self, user_id: int) -> List[int]:
+    async def get_findings_by_user(self, user_id: int) -> List[str]:
         finders = await self.get_finders_by_user(user_id)
-        findings: List[str] = []
-        findings.clear()
-        for finder in finders:
-            findings.extend(finder['offers'])
         logging.info(f"Fetching findings for user ID: {user_id}")
-        return findings
+        return await self.evaluation_manager.get_matched_ids(finder['finder_id'] for finder in finders)
+
+    async def get_finders_with_offer(self, user_id: int, offer_id: str) -> List[Finder]:
+        """The user's finders that matched the offer"""
+        finders = await self.get_finders_by_user(user_id)
+        matching = await self.evaluation_manager.get_matching_finder_ids([finder['finder_id'] for finder in finders], offer_id)
+        return [finder for finder in finders if finder['finder_id'] in matching]
 
     async def set_offer_to_finder(self, finder_id: int, offer_id: str):
-        await self.finders_collection.update_one(
-            {'finder_id': finder_id},
-            {'$push': {'offers': offer_id}}
-        )
+        await self.evaluation_manager.set_matched(finder_id, offer_id, True)
         logging.info(f"Setting offer ID: {offer_id} to finder ID: {finder_id}")
 
     async def delete_offer_from_finder(self, finder_id: int, offer_id: str):
-        await self.finders_collection.update_one(
-            {'finder_id': finder_id},
-            {'$pull': {'offers': offer_id}}
-        )
+        await self.evaluation_manager.set_matched(finder_id, offer_id, False)
         logging.info(f"Deleting offer ID: {offer_id} from finder ID: {finder_id}")
 
     async def find_offers(self, finder: dict, address: str) -> None:
         finder_id = finder['finder_id']
         duration = finder['duration']
-        offers = await self.flat_offers_manager.get_active_offers()
-        new_offers = []
+        # Match view of the finder's city and offer type only; cards are loaded for the offers that match
+        offers = await self.flat_offers_manager.get_active_offers(finder['city_id'], finder['offer_type_id'])
+        evaluated = await self.evaluation_manager.get_evaluated_ids(finder_id, [offer['data_id'] for offer in offers])
+        if LEGACY_FINDER_LISTS:
+            # Finders not yet moved by migrate_finder_evaluations.py still carry their lists
+            evaluated.update(finder.get('parsed_offers', []))
+        # Offers matched on their listing card alone are evaluated again once the detail page is in
+        provisional = await self.evaluation_manager.get_provisional_matches(finder_id, [
+            offer['data_id'] for offer in offers
+            if offer['data_id'] in evaluated and offer.get('details_parsed') is not False
+        ])
+        evaluations: List[Dict] = []
+        reevaluations: List[Dict] = []
+        new_offer_ids = []
         for offer in offers:
-            if offer['offer_type_id'] != finder['offer_type_id'] or offer['city_id'] != finder['city_id']:
-                logging.info(f"Offer not added due to type or city: {offer['data_id']}")
-                continue
-            if offer['data_id'] in finder['parsed_offers']:
+            if offer['data_id'] in evaluated and offer['data_id'] not in provisional:
                 logging.info("Offer already parsed")
                 continue
             distance = await maps_api.directions(offer['address'], address, finder['type'])
@@ -188,15 +210,25 @@ class FinderManager:
             print(distance)
             print('--------------------------------')
             logging.info("Distance information retrieved")
-            finder['parsed_offers'].append(offer['data_id'])
-            await self.update_finder(finder_id, finder)
             print(offer)
             print(finder)
             print('--------------------------------')
-            if int(distance['routes'][0]['legs'][0]['duration']['value']) < int(duration):
-                finder['offers'].append(offer['data_id'])
-                new_offers.append(offer)
-                await self.update_finder(finder_id, finder)
+            travel_duration = int(distance['routes'][0]['legs'][0]['duration']['value'])
+            matched = travel_duration < int(duration)
+            evaluation = self.evaluation_manager.evaluation(finder_id, offer['data_id'], travel_duration, matched,
+                                                            provisional=offer.get('details_parsed') is False)
+            if offer['data_id'] in provisional:
+                reevaluations.append(evaluation)
+                if provisional[offer['data_id']]:
+                    # The user was notified when the card matched
+                    continue
+            else:
+                evaluations.append(evaluation)
+            if len(evaluations) >= EVALUATION_BATCH_SIZE:
+                await self.evaluation_manager.add_evaluations(evaluations)
+                evaluations = []
+            if matched:
+                new_offer_ids.append(offer['data_id'])
                 logging.info(f"Offer added for: {duration}, offer ID: {offer['data_id']}")
                 logging.info(f"Because duration is: {distance['routes'][0]['legs'][0]['duration']['value']}")
             else:
@@ -204,11 +236,15 @@ class FinderManager:
                 logging.info(f"Duration: {distance['routes'][0]['legs'][0]['duration']['value']/60}, offer type ID: {offer['offer_type_id']}, while finder type ID is: {finder['offer_type_id']} and duration is: {duration/ 60}")
                 continue
             logging.info("____________________")
-        await self.update_finder(finder_id, finder)
+        await self.evaluation_manager.add_evaluations(evaluations)
+        await self.evaluation_manager.replace_evaluations(reevaluations)
         logging.info(f"Finding offers for finder ID: {finder_id} at address: {address}")
-        return new_offers
+        return await self.flat_offers_manager.get_offers(new_offer_ids)
 
     async def delete_incomplete_finders(self):
-        finders = self.finders_collection.find({'is_active': True, 'duration': -1})
+        finders = await run_query(
+            'finders.find',
+            lambda: list(self.finders_collection.find({'is_active': True, 'duration': -1}))
+        )
         for finder in finders:
             await self.delete_finder(finder['finder_id'])
@@ -1,50 +1,61 @@
-from typing import Dict, Optional, List
+from typing import Optional, List
 import time
 from datetime import datetime, timedelta
-from decimal import Decimal
-from database.database import create_database, validate_flat_offer
+from database.database import get_database, validate_flat_offer
+from database.executor import run_query
+from database.cache import LRUCache, NOT_FOUND
+from database.views import ID_VIEW, MATCH_VIEW, CARD_VIEW, DETAIL_VIEW
+from database.models import Offer, to_document
 import logging  # Import logging module
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-db = create_database()
-
-if db is None:
-    print("Database not initialized")
-    exit(1)
-
 class FlatOffersManager:
     def __init__(self):
-        self.db = db
-        self.offers_collection = self.db['flat_offers']
-        self.cached_offers: Dict[str, dict] = {}
-        self.last_access: Dict[str, float] = {}
-        self.cache_duration = 600  # 10 minutes in seconds
+        self.cache = LRUCache('flat_offers')
         self.life_duration = 10*24*60*60  # 10 days in seconds
         logging.info("FlatOffersManager initialized")  # Log initialization
 
-    async def get_offer(self, data_id: str) -> Optional[dict]:
-        current_time = time.time()
+    @property
+    def db(self):
+        return get_database()
 
+    @property
+    def offers_collection(self):
+        return self.db['flat_offers']
+
+    async def get_offer(self, data_id: str) -> Optional[Offer]:
         # Check if offer is in cache and still fresh
-        if data_id in self.cached_offers:
-            if current_time - self.last_access[data_id] < self.cache_duration:
-                self.last_access[data_id] = current_time
-                return self.cached_offers[data_id]
-            else:
-                # Remove expired cache
-                del self.cached_offers[data_id]
-                del self.last_access[data_id]
+        offer = self.cache.get(data_id)
+        if offer is NOT_FOUND:
+            return None
+        if offer is not None:
+            return offer
 
         # Get from database
-        offer = self.offers_collection.find_one({'data_id': data_id})
+        token = self.cache.token()
+        offer = await run_query('flat_offers.find_one', lambda: Offer.from_document(
+            self.offers_collection.find_one({'data_id': data_id}, DETAIL_VIEW)
+        ))
         if offer and offer['is_active']:
-            self.cached_offers[data_id] = offer
-            self.last_access[data_id] = current_time
+            self.cache.set(data_id, offer, token=token)
             return offer
+        if offer is None:
+            self.cache.set_missing(data_id, token)
         return None
 
+    async def get_offers(self, data_ids: List[str], view: dict = CARD_VIEW) -> List[Offer]:
+        """Get active offers by data_id in one query, in the order of data_ids; the view must include data_id"""
+        if not data_ids:
+            return []
+        offers = await run_query('flat_offers.find', lambda: Offer.from_documents(self.offers_collection.find(
+            {'data_id': {'$in': list(data_ids)}, 'is_active': True},
+            view
+        )))
+        by_id = {offer['data_id']: offer for offer in offers}
+        return [by_id[data_id] for data_id in data_ids if data_id in by_id]
+
     async def save_offer(self, offer_data: dict):
         """Save a new flat offer if it doesn't already exist"""
         data_id: str = offer_data['data_id']
@@ -52,7 +63,7 @@ class FlatOffersManager:
             logging.warning("Invalid offer data")  # Log warning for invalid data
             return False
         # Check if the offer already exists
-        existing_offer = self.get_offer(data_id)
+        existing_offer = await self.get_offer(data_id)
         if existing_offer:
             return False # Exit if the offer already exists
 
@@ -64,11 +75,12 @@ class FlatOffersManager:
                 'listed_at': datetime.now()
             }
         # Update cache
-        self.cached_offers[data_id] = offer_data
-        self.last_access[data_id] = time.time()
+        self.cache.set(data_id, Offer.from_document(offer_data))
 
         # Update database
-        self.offers_collection.update_one(
+        await run_query(
+            'flat_offers.update_one',
+            self.offers_collection.update_one,
             {'data_id': data_id},
             {'$set': offer_data},
             upsert=True
@@ -79,26 +91,24 @@ class FlatOffersManager:
         offer = await self.get_offer(data_id)
         if offer:
             offer['is_active'] = False
-            self.offers_collection.update_one(
+            await run_query(
+                'flat_offers.update_one',
+                self.offers_collection.update_one,
                 {'data_id': data_id},
                 {'$set': {'is_active': False}}
             )
             # Remove from cache
-            if data_id in self.cached_offers:
-                del self.cached_offers[data_id]
-                del self.last_access[data_id]
+            self.cache.delete(data_id)
 
     async def delete_offer(self, data_id: str):
         """Permanently delete an offer"""
         # Remove from cache
-        if data_id in self.cached_offers:
-            del self.cached_offers[data_id]
-            del self.last_access[data_id]
+        self.cache.delete(data_id)
 
         # Remove from database
-        self.offers_collection.delete_one({'data_id': data_id})
+        await run_query('flat_offers.delete_one', self.offers_collection.delete_one, {'data_id': data_id})
 
-    async def find_matching_offers(self, user_settings: dict) -> List[dict]:
+    async def find_matching_offers(self, user_settings: dict) -> List[Offer]:
         """Find offers matching user preferences"""
         query = {'is_active': True}
 
@@ -108,7 +118,13 @@ class FlatOffersManager:
 
         # Add price range filter if specified
         if user_settings.get('max_price'):
-            query['costs.base_rent'] = {'$lte': Decimal(str(user_settings['max_price']))}
+            query['total_rent_value'] = {'$lte': float(user_settings['max_price'])}
+
+        # Add size and move-in filters if specified
+        if user_settings.get('min_area'):
+            query['area_value'] = {'$gte': float(user_settings['min_area'])}
+        if user_settings.get('move_in_by'):
+            query['available_from'] = {'$lte': user_settings['move_in_by']}
 
         # Add furnished filter if specified
         if user_settings.get('furnished') is not None:
@@ -119,66 +135,102 @@ class FlatOffersManager:
             query['address.district'] = {'$in': user_settings['districts']}
 
         # Find matching offers
-        offers = self.offers_collection.find(
+        return await run_query('flat_offers.find', lambda: Offer.from_documents(self.offers_collection.find(
             query,
+            CARD_VIEW,
             sort=[('availability.listed_at', -1)]  # Sort by newest first
-        ).limit(10)  # Limit to 10 results
-
-        return list(offers)
+        ).limit(10)))  # Limit to 10 results
 
     async def get_active_offers_count(self) -> int:
         """Get count of active offers"""
-        return await self.offers_collection.count_documents({'is_active': True})
+        return await run_query('flat_offers.count_documents', self.offers_collection.count_documents, {'is_active': True})
 
     async def cleanup_old_offers(self, days: int = 30):
         """Deactivate offers older than specified days"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
 
         # Find and deactivate old offers
-        old_offers = self.offers_collection.find({
+        old_offers = await run_query('flat_offers.find', lambda: list(self.offers_collection.find({
             'is_active': True,
             'availability.listed_at': {'$lt': cutoff_date}
-        })
+        }, ID_VIEW)))
 
         for offer in old_offers:
-            self.deactivate_offer(offer['data_id'])
+            await self.deactivate_offer(offer['data_id'])
 
-    async def get_offers_by_price_range(self, min_price: float, max_price: float) -> List[dict]:
+    async def get_offers_by_price_range(self, min_price: float, max_price: float) -> List[Offer]:
         """Get active offers within price range"""
         query = {
             'is_active': True,
-            'costs.base_rent': {
-                '$gte': Decimal(str(min_price)),
-                '$lte': Decimal(str(max_price))
+            'total_rent_value': {
+                '$gte': float(min_price),
+                '$lte': float(max_price)
             }
         }
+        return await run_query('flat_offers.find', lambda: Offer.from_documents(self.offers_collection.find(
+            query,
+            CARD_VIEW,
+            sort=[('total_rent_value', 1)]
+        )))
+
     async def update_offer_data(self, data_id: str, updated_data: dict) -> bool:
         """Update offer data by data_id"""
-        result = self.offers_collection.update_one(
+        result = await run_query(
+            'flat_offers.update_one',
+            self.offers_collection.update_one,
             {'data_id': data_id},
-            {'$set': updated_data}
+            {'$set': to_document(updated_data)}
         )
+        self.cache.delete(data_id)
         return result.modified_count > 0
 
-    async def get_active_offers(self) -> List[dict]:
-        """Get active offers"""
-        return list(self.offers_collection.find({'is_active': True}))
+    async def mark_notified(self, data_ids: List[str]):
+        """Record that offers were sent to users, so the parser re-checks them first"""
+        if data_ids:
+            await run_query(
+                'flat_offers.update_many',
+                self.offers_collection.update_many,
+                {'data_id': {'$in': data_ids}},
+                {'$set': {'notified_at': datetime.now()}}
+            )
+
+    async def get_active_offers(self, city_id: Optional[int] = None, offer_type_id: Optional[int] = None,
+                                view: dict = MATCH_VIEW) -> List[Offer]:
+        """Get active offers, optionally of one city and offer type
+
+        Offers stored from a listing card only (details_parsed false) are included, so
+        they can be matched on the card's address before the parser has enriched them.
+        """
+        query = {'is_active': True}
+        if city_id is not None:
+            query['city_id'] = city_id
+        if offer_type_id is not None:
+            query['offer_type_id'] = offer_type_id
+        return await run_query('flat_offers.find',
+                               lambda: Offer.from_documents(self.offers_collection.find(query, view)))
+
+    async def has_offers_changed_since(self, since: datetime) -> bool:
+        """Whether the parser stored a new offer or an offer's details since a time"""
+        return await run_query('flat_offers.find_one', lambda: self.offers_collection.find_one(
+            {'$or': [{'created_at': {'$gte': since}}, {'enriched_at': {'$gte': since}}]}, ID_VIEW
+        ) is not None)
 
     async def deactivate_expired_offers(self):
         """Deactivate offers older than life duration"""
         cutoff_date = time.time() - self.life_duration
-        self.offers_collection.update_many(
+        await run_query(
+            'flat_offers.update_many',
+            self.offers_collection.update_many,
             {'is_active': True, 'created_at': {'$lt': cutoff_date}},
             {'$set': {'is_active': False}}
         )
 
     async def clean_expired_cache(self):
         """Clean expired cache"""
-        for data_id in list(self.cached_offers):
-            if self.last_access[data_id] + self.cache_duration < time.time():
-                del self.cached_offers[data_id]
-                del self.last_access[data_id]
-
-    async def get_all_offers(self) -> List[dict]:
-        """Get all offers"""
-        return list(self.offers_collection.find())
+        self.cache.purge_expired()
+        self.cache.report()
+
+    async def get_all_offers(self, view: Optional[dict] = None) -> List[Offer]:
+        """Get all offers, whole documents unless a view is given"""
+        return await run_query('flat_offers.find',
+                               lambda: Offer.from_documents(self.offers_collection.find({}, view)))
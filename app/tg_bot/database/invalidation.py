@@ -0,0 +1,126 @@
+from typing import Dict, Optional, Tuple
+from threading import Event, Thread
+import os
+import logging
+from pymongo.errors import OperationFailure, PyMongoError
+from database.database import get_database
+from database.cache import LRUCache
+
+# Cache lifetime once the change stream is open; stale entries are evicted by change events instead
+CACHE_WATCHED_TTL = float(os.getenv('CACHE_WATCHED_TTL', '3600'))
+# Seconds the change stream waits for events before checking whether it should stop
+WATCH_MAX_AWAIT_MS = 1000
+WATCH_RETRY_DELAY = 5
+# Server error codes of a deployment without change streams (standalone mongod)
+CHANGE_STREAMS_UNSUPPORTED = [40573]
+
+class CacheInvalidator(Thread):
+    """Evicts cache entries when their documents change in MongoDB, including writes of other processes
+
+    Watches the cached collections with a change stream, which needs a replica set
+    (a single-node one is enough). Inserts, updates and replaces evict the entry of
+    the document's key field, looked up with fullDocument=updateLookup. Deletes
+    carry only the _id, so they evict by the pre-image where the collection records
+    one and clear the whole cache otherwise. While the stream is open the caches
+    keep entries for CACHE_WATCHED_TTL; without change streams they keep their
+    own TTL, which then bounds how stale an entry can get. A read that was still
+    running when its key was evicted is not cached, see LRUCache.token().
+    """
+
+    def __init__(self, caches: Dict[str, Tuple[LRUCache, str]]):
+        # collection name -> (cache, key field the cache is keyed by)
+        super().__init__(name='cache-invalidator', daemon=True)
+        self.caches = caches
+        self.default_ttls = {collection: cache.ttl for collection, (cache, key_field) in caches.items()}
+        self.stopped = Event()
+        self.resume_token: Optional[dict] = None
+        # Pre-images need MongoDB 6.0; older servers reject the option
+        self.pre_images = True
+        self.counters: Dict[str, int] = {'events': 0, 'evictions': 0, 'clears': 0, 'restarts': 0}
+
+    def pipeline(self) -> list:
+        # Only the key fields of the documents are needed, not whole offers
+        projection = {'operationType': 1, 'ns': 1, 'documentKey': 1}
+        for cache, key_field in self.caches.values():
+            projection[f'fullDocument.{key_field}'] = 1
+            projection[f'fullDocumentBeforeChange.{key_field}'] = 1
+        return [
+            {'$match': {'ns.coll': {'$in': list(self.caches)},
+                        'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}},
+            {'$project': projection}
+        ]
+
+    def set_watched(self, watched: bool):
+        for collection, (cache, key_field) in self.caches.items():
+            cache.ttl = CACHE_WATCHED_TTL if watched else self.default_ttls[collection]
+
+    def clear(self):
+        for cache, key_field in self.caches.values():
+            cache.clear()
+        self.counters['clears'] += 1
+
+    def handle(self, change: dict):
+        self.counters['events'] += 1
+        collection = change.get('ns', {}).get('coll')
+        if collection not in self.caches:
+            return
+        cache, key_field = self.caches[collection]
+        document = change.get('fullDocument') or change.get('fullDocumentBeforeChange')
+        if document and key_field in document:
+            cache.delete(document[key_field])
+            self.counters['evictions'] += 1
+        else:
+            # A delete without pre-image, or a document deleted before its update was looked up
+            cache.clear()
+            self.counters['clears'] += 1
+
+    def watch(self):
+        database = get_database()
+        options = {'full_document_before_change': 'whenAvailable'} if self.pre_images else {}
+        with database.watch(self.pipeline(), full_document='updateLookup', resume_after=self.resume_token,
+                            max_await_time_ms=WATCH_MAX_AWAIT_MS, **options) as stream:
+            self.set_watched(True)
+            logging.info(f"Watching {', '.join(self.caches)} for cache invalidation")
+            while not self.stopped.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self.handle(change)
+                self.resume_token = stream.resume_token
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.watch()
+            except OperationFailure as e:
+                self.set_watched(False)
+                if e.code in CHANGE_STREAMS_UNSUPPORTED or 'replica set' in str(e):
+                    logging.warning("Change streams need a replica set, cache entries expire by TTL only")
+                    return
+                if self.pre_images and 'fullDocumentBeforeChange' in str(e):
+                    logging.info("Server has no change stream pre-images, deletes clear the whole cache")
+                    self.pre_images = False
+                    continue
+                # The resume token may have left the oplog; events since then are lost
+                logging.warning(f"Cache invalidation stream failed, clearing caches: {str(e)}")
+                self.resume_token = None
+                self.clear()
+            except PyMongoError as e:
+                # Connection trouble; the stream resumes from the last token
+                self.set_watched(False)
+                logging.warning(f"Cache invalidation stream interrupted: {str(e)}")
+            except Exception as e:
+                # Entries cached for CACHE_WATCHED_TTL would otherwise go stale unnoticed
+                self.set_watched(False)
+                self.clear()
+                logging.error(f"Cache invalidation stopped: {str(e)}")
+                return
+            self.counters['restarts'] += 1
+            self.stopped.wait(WATCH_RETRY_DELAY)
+        self.set_watched(False)
+
+    def stop(self):
+        self.stopped.set()
+
+    def report(self):
+        logging.info(f"Cache invalidation: {self.counters['events']} events, {self.counters['evictions']} evictions, "
+                     f"{self.counters['clears']} clears, {self.counters['restarts']} restarts")
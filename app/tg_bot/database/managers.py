@@ -0,0 +1,19 @@
+from database.flat_offers_manager import FlatOffersManager
+from database.finder_manager import FinderManager
+from database.user_manager import UserManager
+from database.evaluation_manager import EvaluationManager
+from database.invalidation import CacheInvalidator
+
+# One instance of each manager per process, so every handler shares the same caches;
+# none of them touches the database until it is first used, which main() does before polling
+flat_offers_manager = FlatOffersManager()
+evaluation_manager = EvaluationManager()
+finder_manager = FinderManager(flat_offers_manager, evaluation_manager)
+user_manager = UserManager(finder_manager)
+
+# Started by main(); evicts cached documents that the parser or the cleanup jobs change
+cache_invalidator = CacheInvalidator({
+    'flat_offers': (flat_offers_manager.cache, 'data_id'),
+    'finders': (finder_manager.cache, 'finder_id'),
+    'users': (user_manager.cache, 'chat_id')
+})
@@ -0,0 +1,157 @@
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+from collections.abc import MutableMapping
+import sys
+
+# Stands in for unset slots, which have no value to read
+_MISSING = object()
+
+class Model(MutableMapping):
+    """Document with its known fields in __slots__ instead of a per-instance dict
+
+    Reads and writes like the pymongo dict it replaces: model['name'], 'name' in model,
+    model.get('name'), dict(model). A field that was never set is missing, as in the
+    document. Fields outside FIELDS are kept in `extras`, created on first use, so
+    documents written by newer code lose nothing. The bot and the parser keep
+    identical copies of this module.
+
+    Decoded documents repeat the keys of nested dicts as separate strings; the keys
+    of the fields in SHARED_KEYS are interned so all instances share one copy.
+    """
+
+    __slots__ = ('extras',)
+    FIELDS: Tuple[str, ...] = ()
+    SHARED_KEYS: Tuple[str, ...] = ()
+    _FIELD_SET: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = tuple(cls.__slots__)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, document: Optional[Dict[str, Any]] = None, **fields):
+        self.extras = None
+        for key, value in dict(document or {}, **fields).items():
+            self[key] = value
+
+    @classmethod
+    def from_document(cls, document: Optional[Dict[str, Any]]):
+        """Model of a decoded document, None for None; nested values are taken over as they are"""
+        if document is None:
+            return None
+        model = cls.__new__(cls)
+        model.extras = None
+        known = cls._FIELD_SET
+        for key, value in document.items():
+            if key in known:
+                setattr(model, key, value)
+            else:
+                if model.extras is None:
+                    model.extras = {}
+                model.extras[key] = value
+        for field in cls.SHARED_KEYS:
+            value = getattr(model, field, None)
+            if type(value) is dict:
+                setattr(model, field, {sys.intern(key): item for key, item in value.items()})
+        return model
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict[str, Any]]) -> list:
+        """Models of all documents of a cursor"""
+        return [cls.from_document(document) for document in documents]
+
+    def to_document(self) -> Dict[str, Any]:
+        """Plain dict for pymongo writes, with the same keys as the document it was read from"""
+        document = {}
+        for field in self.FIELDS:
+            value = getattr(self, field, _MISSING)
+            if value is not _MISSING:
+                document[field] = value
+        if self.extras:
+            document.update(self.extras)
+        return document
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extras is None:
+            raise KeyError(key)
+        return self.extras[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[key] = value
+
+    def __delitem__(self, key: str):
+        if key in self._FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self.extras is not None and key in self.extras:
+            del self.extras[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self.extras:
+            yield from self.extras
+
+    def __len__(self) -> int:
+        return sum(1 for field in self.FIELDS if hasattr(self, field)) + len(self.extras or ())
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._FIELD_SET:
+            return hasattr(self, key)
+        return self.extras is not None and key in self.extras
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._FIELD_SET:
+            return getattr(self, key, default)
+        if self.extras is None:
+            return default
+        return self.extras.get(key, default)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_document()!r})"
+
+class Offer(Model):
+    """A flat_offers document; FLAT_OFFERS_SCHEMA.md describes its fields, details_parsed and enriched_at included"""
+
+    __slots__ = (
+        '_id', 'data_id', 'link', 'url', 'is_active', 'name', 'type', 'offer_type', 'offer_type_id', 'city', 'city_id',
+        'address', 'area', 'total_rent', 'costs', 'availability', 'object_details', 'description', 'images',
+        'total_rent_value', 'area_value', 'costs_values', 'available_from', 'available_to',
+        'created_at', 'enriched_at', 'details_parsed', 'notified_at', 'removed_at', 'changed_at', 'liveness', 'changes'
+    )
+    SHARED_KEYS = ('costs', 'costs_values', 'availability')
+
+class Finder(Model):
+    """A finders document"""
+
+    __slots__ = (
+        '_id', 'finder_id', 'user_id', 'is_active', 'created_at', 'type', 'offer_type', 'offer_type_id', 'city_id',
+        'duration'
+    )
+
+class User(Model):
+    """A users document"""
+
+    __slots__ = (
+        '_id', 'chat_id', 'is_active', 'name', 'notifications', 'preferences', 'premium_subscription', 'language',
+        'state', 'city_id', 'type', 'finder_id'
+    )
+    SHARED_KEYS = ('preferences',)
+
+def to_document(value: Any) -> Any:
+    """Plain dict of a model for pymongo writes; anything else is returned as it is"""
+    return value.to_document() if isinstance(value, Model) else value
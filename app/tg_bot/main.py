@@ -11,10 +11,9 @@ from telegram.ext import (
     ContextTypes,
     filters
 )
-from database.user_manager import UserManager
-from database.finder_manager import FinderManager
-from database.flat_offers_manager import FlatOffersManager
-from database.database import get_user_fields, get_finder_fields
+from database.managers import user_manager, flat_offers_manager, finder_manager, cache_invalidator
+from database.database import get_database, get_user_fields, get_finder_fields
+from database.executor import log_latency_stats
 from answers import *
 
 from dotenv import load_dotenv
@@ -23,6 +22,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+# Seconds between two matching runs; a run without new offers or finders since the last one is skipped
+MATCH_INTERVAL = int(os.getenv('MATCH_INTERVAL', '120'))
+# A full matching run at least this often, whatever changed
+MATCH_FULL_INTERVAL = int(os.getenv('MATCH_FULL_INTERVAL', '3600'))
 LANGUAGE_FILES = {}
 language_dir = './languages'
 for filename in os.listdir(language_dir):
@@ -52,11 +55,6 @@ def init_variables():
                 logging.error(f"Error loading language file for {lang}: {str(e)}")
 
 
-    # In-memory user settings
-    user_manager = UserManager()
-    flat_offers_manager = FlatOffersManager()
-    finder_manager = FinderManager(flat_offers_manager)
-
     # Configure logging
     logging.basicConfig(level=logging.INFO)
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -283,8 +281,12 @@ async def clean_cache(context: ContextTypes.DEFAULT_TYPE):
     await user_manager.clean_expired_cache()
     await finder_manager.clean_expired_cache()
     await flat_offers_manager.clean_expired_cache()
+    cache_invalidator.report()
     logging.info("Cache cleanup completed")
 
+async def report_database_latency(context: ContextTypes.DEFAULT_TYPE):
+    log_latency_stats()
+
 async def main_menu_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     chat_id = query.message.chat_id
@@ -538,6 +540,14 @@ async def user_data_entry_callback_handler(update: Update, context: ContextTypes
     await send_message_with_keyboard(context.bot, update, user_data, 'user_data_entry_name', modify_message=False)
 
 async def find_new_offers_for_users(context: ContextTypes.DEFAULT_TYPE):
+    started = datetime.now()
+    last_run = context.bot_data.get('matched_at')
+    last_full_run = context.bot_data.get('fully_matched_at')
+    full_run = last_full_run is None or (started - last_full_run).total_seconds() >= MATCH_FULL_INTERVAL
+    if not full_run and not (await flat_offers_manager.has_offers_changed_since(last_run)
+                             or await finder_manager.has_finders_created_since(last_run.timestamp())):
+        logging.debug("No offers stored or enriched and no finders created since the last matching run, skipping it")
+        return
     users = await user_manager.get_all_users()
     for user in users:
         chat_id = user.get('chat_id')
@@ -556,15 +566,23 @@ async def find_new_offers_for_users(context: ContextTypes.DEFAULT_TYPE):
                 text_lang['offer_data']['location'] + offer['address'] + '\n' +
                 text_lang['offer_data']['rent'] + str(offer['total_rent']) + '\n' +
                 text_lang['offer_data']['link'] + offer['link'])
-            keyboard = await create_keyboard({f"offer_details_{offer.get('id')}" : text_lang['offer_data']['keyboard']['offer_details']})
+            keyboard = await create_keyboard({f"offer_details_{offer['data_id']}" : text_lang['offer_data']['keyboard']['offer_details']})
             reply_markup = InlineKeyboardMarkup(keyboard)
             await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode='HTML')
+        await flat_offers_manager.mark_notified([offer['data_id'] for offer in new_offers])
 
 
         # every new finder has to send notification to the user.
+    # Changes made while the run was going are picked up by the next one
+    context.bot_data['matched_at'] = started
+    if full_run:
+        context.bot_data['fully_matched_at'] = started
 
 def main():
     init_variables()
+    # Connect, create collections and indexes before polling starts: handlers resolve
+    # collections on the event loop, where the first get_database() would block it
+    get_database()
 
     # Initialize bot with application builder
     application = ApplicationBuilder().token(TOKEN).build()
@@ -597,10 +615,15 @@ def main():
     # Set up a job queue to clean the cache every 10 minutes
     job_queue = application.job_queue
     job_queue.run_repeating(clean_cache, interval=600, first=0)  # 600 seconds = 10 minutes
+    job_queue.run_repeating(report_database_latency, interval=600, first=600)
     job_queue.run_repeating(clean_database, interval=12*60*60, first=0)  # 12 hours
-    job_queue.run_repeating(find_new_offers_for_users, interval=1*60*60, first=0) # 1 hour
+    job_queue.run_repeating(find_new_offers_for_users, interval=MATCH_INTERVAL, first=0)
+
+    # Evict cached documents changed by the parser and the cleanup jobs
+    cache_invalidator.start()
 
     application.run_polling(drop_pending_updates=True)
+    cache_invalidator.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,74 @@
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from database.database import get_database, ensure_indexes
+from database.evaluation_manager import DUPLICATE_KEY
+import argparse
+import logging
+import dotenv
+
+dotenv.load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def migrate_finder_evaluations(batch_size: int = 1000, keep_lists: bool = False):
+    """Move the offers and parsed_offers lists of finder documents into the finder_evaluations collection
+
+    Offers in `offers` are stored as matched, the rest of `parsed_offers` as not
+    matched; their travel durations were never stored. Safe to run again: pairs that
+    already exist are skipped by the unique index.
+    """
+    db = get_database()
+    ensure_indexes(db)
+    finders_collection = db['finders']
+    evaluations_collection = db['finder_evaluations']
+    query = {'$or': [{'offers': {'$exists': True}}, {'parsed_offers': {'$exists': True}}]}
+    now = datetime.now()
+
+    evaluations = []
+    finder_ids = []
+    inserted = 0
+    migrated = 0
+
+    def flush():
+        """Store the pending evaluations, then drop the lists of the finders they came from"""
+        nonlocal evaluations, finder_ids, inserted, migrated
+        if evaluations:
+            try:
+                inserted += len(evaluations_collection.insert_many(evaluations, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                inserted += e.details.get('nInserted', 0)
+                # Duplicates are pairs stored by an earlier run; other errors keep the lists in place
+                if any(error.get('code') != DUPLICATE_KEY for error in e.details.get('writeErrors', [])):
+                    raise
+        if not keep_lists:
+            finders_collection.update_many({'_id': {'$in': finder_ids}}, {'$unset': {'offers': '', 'parsed_offers': ''}})
+        migrated += len(finder_ids)
+        logging.info(f"Migrated {migrated} finders so far")
+        evaluations, finder_ids = [], []
+
+    for finder in finders_collection.find(query, {'finder_id': 1, 'offers': 1, 'parsed_offers': 1}):
+        matched = set(finder.get('offers') or [])
+        # parsed_offers lists every evaluated offer; offers added without evaluation are only in offers
+        for offer_id in dict.fromkeys(list(finder.get('parsed_offers') or []) + list(matched)):
+            evaluations.append({
+                'finder_id': finder['finder_id'],
+                'offer_id': offer_id,
+                'duration': None,
+                'matched': offer_id in matched,
+                'evaluated_at': now
+            })
+        finder_ids.append(finder['_id'])
+        if len(evaluations) >= batch_size:
+            flush()
+    if finder_ids:
+        flush()
+
+    logging.info(f"Migration finished - {migrated} finders, {inserted} evaluations stored")
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Move per-finder offer lists into the finder_evaluations collection')
+    arg_parser.add_argument('--batch-size', type=int, default=1000)
+    arg_parser.add_argument('--keep-lists', action='store_true', help='leave the lists in the finder documents')
+    args = arg_parser.parse_args()
+    migrate_finder_evaluations(args.batch_size, args.keep_lists)